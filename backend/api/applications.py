@@ -0,0 +1,130 @@
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.api.auth import require_admin_token
+from backend.models.application import Application
+from backend.models.user import User
+from backend.schemas import ApplicationOut, ApplicationStatusUpdate, Page
+from bot.utils.database import get_read_db, read_session, update_application_status
+
+router = APIRouter(prefix="/applications", tags=["applications"], dependencies=[Depends(require_admin_token)])
+
+EXPORT_COLUMNS = (
+    Application.id,
+    Application.faculty_code,
+    Application.status,
+    Application.created_at,
+    Application.user_id,
+    User.telegram_id,
+    User.first_name,
+    User.last_name,
+    User.phone,
+    User.email,
+)
+EXPORT_BATCH_SIZE = 1000
+
+
+def _filtered(stmt, faculty_code, status, created_from, created_to):
+    if faculty_code:
+        stmt = stmt.where(Application.faculty_code == faculty_code)
+    if status:
+        stmt = stmt.where(Application.status == status)
+    if created_from:
+        stmt = stmt.where(Application.created_at >= created_from)
+    if created_to:
+        stmt = stmt.where(Application.created_at < created_to)
+    return stmt
+
+
+@router.get("/", response_model=Page[ApplicationOut])
+async def list_applications(
+    cursor: int = Query(0, ge=0, description="id последней заявки предыдущей страницы"),
+    limit: int = Query(50, ge=1, le=500),
+    faculty_code: Optional[str] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+    db: AsyncSession = Depends(get_read_db),
+):
+    # id растет в порядке подачи, поэтому keyset по id дает хронологический порядок
+    stmt = _filtered(
+        select(Application).where(Application.id > cursor),
+        faculty_code, status, created_from, created_to
+    )
+    result = await db.execute(stmt.order_by(Application.id).limit(limit))
+    applications = result.scalars().all()
+    next_cursor = str(applications[-1].id) if len(applications) == limit else None
+    return Page[ApplicationOut](
+        items=[ApplicationOut.model_validate(app) for app in applications],
+        next_cursor=next_cursor
+    )
+
+
+def _export_value(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+async def _export_rows(stmt, fmt):
+    names = [column.key for column in EXPORT_COLUMNS]
+    # Сессия открывается внутри генератора: она должна жить, пока идет ответ
+    async with read_session() as session:
+        result = await session.stream(stmt.execution_options(yield_per=EXPORT_BATCH_SIZE))
+        if fmt == "csv":
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            writer.writerow(names)
+            async for rows in result.partitions():
+                writer.writerows([_export_value(value) for value in row] for row in rows)
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+            if buffer.tell():
+                yield buffer.getvalue()
+        else:
+            async for rows in result.partitions():
+                yield "".join(
+                    json.dumps(dict(zip(names, map(_export_value, row))), ensure_ascii=False) + "\n"
+                    for row in rows
+                )
+
+
+@router.get("/export")
+async def export_applications(
+    format: str = Query("ndjson", pattern="^(ndjson|csv)$"),
+    faculty_code: Optional[str] = None,
+    status: Optional[str] = None,
+    created_from: Optional[datetime] = None,
+    created_to: Optional[datetime] = None,
+):
+    """Потоковая выгрузка заявок: строки читаются из БД порциями и сразу отдаются клиенту."""
+    stmt = _filtered(
+        select(*EXPORT_COLUMNS).join(User, User.id == Application.user_id),
+        faculty_code, status, created_from, created_to
+    ).order_by(Application.id)
+
+    if format == "csv":
+        media_type = "text/csv; charset=utf-8"
+        filename = "applications.csv"
+    else:
+        media_type = "application/x-ndjson"
+        filename = "applications.ndjson"
+    return StreamingResponse(
+        _export_rows(stmt, format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
+
+@router.patch("/{application_id}/status")
+async def change_application_status(application_id: int, payload: ApplicationStatusUpdate):
+    changed = await update_application_status(application_id, payload.status)
+    if changed is None:
+        raise HTTPException(status_code=404, detail="Application not found")
+    return {"id": application_id, "status": payload.status, "changed": changed}
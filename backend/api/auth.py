@@ -0,0 +1,14 @@
+import secrets
+
+from fastapi import Header, HTTPException
+
+from bot.config import Config
+
+
+async def require_admin_token(x_admin_token: str = Header("")):
+    """Пускает к данным абитуриентов только с токеном администратора из ADMIN_API_TOKEN."""
+    if not Config.ADMIN_API_TOKEN:
+        # Без настроенного токена API закрыто полностью
+        raise HTTPException(status_code=503, detail="Admin API is disabled")
+    if not secrets.compare_digest(x_admin_token.encode(), Config.ADMIN_API_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
@@ -0,0 +1,10 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy.ext.asyncio import AsyncSession
+from backend.stats import load_faculty_stats
+from bot.utils.database import get_read_db
+
+router = APIRouter(prefix="/stats", tags=["stats"])
+
+@router.get("/")
+async def get_stats(days: int = Query(14, ge=1, le=366), db: AsyncSession = Depends(get_read_db)):
+    return await load_faculty_stats(db, days=days)
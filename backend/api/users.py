@@ -1,19 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Query
+from sqlalchemy import select
 from sqlalchemy.ext.asyncio import AsyncSession
+from backend.api.auth import require_admin_token
 from backend.models.user import User
-from bot.utils.database import get_db
+from backend.schemas import UserOut, Page
+from bot.utils.database import get_read_db
 
-router = APIRouter(prefix="/users", tags=["users"])
+router = APIRouter(prefix="/users", tags=["users"], dependencies=[Depends(require_admin_token)])
 
-@router.post("/")
-async def create_user(user_data: dict, db: AsyncSession = Depends(get_db)):
-    new_user = User(**user_data)
-    db.add(new_user)
-    await db.commit()
-    return {"id": new_user.id}
+@router.get("/", response_model=Page[UserOut])
+async def list_users(
+    cursor: int = Query(0, ge=0, description="id последнего пользователя предыдущей страницы"),
+    limit: int = Query(50, ge=1, le=500),
+    db: AsyncSession = Depends(get_read_db),
+):
+    # Keyset-пагинация по первичному ключу: стоимость страницы не зависит от ее номера
+    result = await db.execute(
+        select(User).where(User.id > cursor).order_by(User.id).limit(limit)
+    )
+    users = result.scalars().all()
+    next_cursor = str(users[-1].id) if len(users) == limit else None
+    return Page[UserOut](items=[UserOut.model_validate(user) for user in users], next_cursor=next_cursor)
 
-@router.get("/{user_id}")
-async def get_user(user_id: int, db: AsyncSession = Depends(get_db)):
+@router.get("/{user_id}", response_model=UserOut)
+async def get_user(user_id: int, db: AsyncSession = Depends(get_read_db)):
     user = await db.get(User, user_id)
     if not user:
         raise HTTPException(status_code=404, detail="User not found")
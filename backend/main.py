@@ -1,6 +1,8 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from bot.utils.database import engine, Base
+from bot.utils.database import engine
+from backend.migrations import migrate
+from backend.api import users, applications, stats
 
 
 app = FastAPI(title="TUSUR Faculty Selector")
@@ -13,10 +15,13 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+app.include_router(users.router)
+app.include_router(applications.router)
+app.include_router(stats.router)
+
 @app.on_event("startup")
 async def startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+    await migrate(engine)
 
 @app.get("/health")
 async def health_check():
@@ -0,0 +1,96 @@
+# backend/migrations.py
+import asyncio
+
+from sqlalchemy import Table, Column, Integer, String, DateTime, MetaData, select, delete, func, insert
+
+from backend.models.base import Base
+from backend.models.application import Application
+# Модели импортируются, чтобы их таблицы были в Base.metadata
+from backend.models.user import User  # noqa: F401
+from backend.models.questionnaire import Questionnaire  # noqa: F401
+from backend.models.fsm_session import FsmSession
+from backend.models.application_stat import ApplicationStat
+from backend.stats import reconcile_application_stats
+
+schema_version = Table(
+    'schema_version', MetaData(),
+    Column('version', Integer, primary_key=True),
+    Column('name', String(100), nullable=False),
+    Column('applied_at', DateTime, server_default=func.now()),
+)
+
+
+def _create_indexes(conn, table, *names):
+    for index in table.indexes:
+        if not names or index.name in names:
+            index.create(conn, checkfirst=True)
+
+
+def initial_schema(conn):
+    Base.metadata.create_all(conn)
+
+
+def unique_applications(conn):
+    # Дубли, накопившиеся до появления индекса, удаляются: остается самая ранняя заявка
+    keep = (
+        select(func.min(Application.id))
+        .group_by(Application.user_id, Application.faculty_code)
+        .scalar_subquery()
+    )
+    removed = conn.execute(delete(Application).where(Application.id.not_in(keep))).rowcount
+    if removed:
+        print(f"🧹 Удалено дублей заявок: {removed}")
+    _create_indexes(conn, Application.__table__, 'uq_applications_user_faculty')
+
+
+def applications_lookup_indexes(conn):
+    _create_indexes(
+        conn, Application.__table__,
+        'ix_applications_user_created', 'ix_applications_faculty_status'
+    )
+
+
+def fsm_sessions(conn):
+    FsmSession.__table__.create(conn, checkfirst=True)
+
+
+def application_stats(conn):
+    ApplicationStat.__table__.create(conn, checkfirst=True)
+    # Счетчики заполняются по уже поданным заявкам
+    reconcile_application_stats(conn)
+
+
+# Шаги применяются по порядку и должны быть идемпотентными:
+# на новой базе initial_schema уже создает все таблицы и индексы
+MIGRATIONS = [
+    (1, 'initial_schema', initial_schema),
+    (2, 'unique_applications', unique_applications),
+    (3, 'applications_lookup_indexes', applications_lookup_indexes),
+    (4, 'fsm_sessions', fsm_sessions),
+    (5, 'application_stats', application_stats),
+]
+
+
+def run_migrations(conn):
+    """Применяет недостающие миграции. Возвращает список примененных версий."""
+    schema_version.create(conn, checkfirst=True)
+    applied = set(conn.execute(select(schema_version.c.version)).scalars())
+    done = []
+    for version, name, step in MIGRATIONS:
+        if version in applied:
+            continue
+        step(conn)
+        conn.execute(insert(schema_version).values(version=version, name=name))
+        done.append(version)
+        print(f"🗄 Миграция {version} ({name}) применена")
+    return done
+
+
+async def migrate(engine):
+    async with engine.begin() as conn:
+        return await conn.run_sync(run_migrations)
+
+
+if __name__ == "__main__":
+    from bot.utils.database import engine
+    asyncio.run(migrate(engine))
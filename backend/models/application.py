@@ -1,12 +1,20 @@
 # backend/models/application.py
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, func
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index, func
+from sqlalchemy.orm import relationship
 from backend.models.base import Base
 
 
 class Application(Base):
     __tablename__ = 'applications'
+    __table_args__ = (
+        # Одна заявка на факультет от пользователя — гарантирует сама БД
+        Index('uq_applications_user_faculty', 'user_id', 'faculty_code', unique=True),
+        Index('ix_applications_user_created', 'user_id', 'created_at'),
+        Index('ix_applications_faculty_status', 'faculty_code', 'status'),
+    )
     id = Column(Integer, primary_key=True)
     user_id = Column(Integer, ForeignKey('users.id'), nullable=False)
     faculty_code = Column(String(20), nullable=False)
     status = Column(String(50), default='Подана')
-    created_at = Column(DateTime, server_default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime, server_default=func.now())
+    user = relationship('User', back_populates='applications')
\ No newline at end of file
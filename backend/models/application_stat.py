@@ -0,0 +1,12 @@
+# backend/models/application_stat.py
+from sqlalchemy import Column, Integer, String, Date
+from backend.models.base import Base
+
+
+class ApplicationStat(Base):
+    """Счетчик заявок по факультету, статусу и дню подачи."""
+    __tablename__ = 'application_stats'
+    faculty_code = Column(String(20), primary_key=True)
+    status = Column(String(50), primary_key=True)
+    day = Column(Date, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
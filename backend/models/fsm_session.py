@@ -0,0 +1,11 @@
+# backend/models/fsm_session.py
+from sqlalchemy import Column, String, DateTime, JSON
+from backend.models.base import Base
+
+
+class FsmSession(Base):
+    __tablename__ = 'fsm_sessions'
+    key = Column(String(255), primary_key=True)
+    state = Column(String(255))
+    data = Column(JSON, nullable=False, default=dict)
+    updated_at = Column(DateTime, nullable=False, index=True)
@@ -0,0 +1,19 @@
+# backend/models/questionnaire.py
+from sqlalchemy import Column, Integer, String, Float, DateTime, JSON, func
+from backend.models.base import Base
+
+
+class Questionnaire(Base):
+    __tablename__ = 'questionnaires'
+    id = Column(Integer, primary_key=True)
+    telegram_id = Column(Integer, nullable=False, index=True)
+    answers = Column(JSON, nullable=False)
+    faculty_code = Column(String(20))
+    confidence = Column(Float)
+    model_version = Column(String(64))
+    created_at = Column(DateTime, server_default=func.now())
+    rescored_faculty_code = Column(String(20))
+    rescored_confidence = Column(Float)
+    rescored_top = Column(JSON)
+    rescored_model_version = Column(String(64))
+    rescored_at = Column(DateTime)
@@ -1,4 +1,5 @@
 from sqlalchemy import Column, Integer, String, Boolean
+from sqlalchemy.orm import relationship
 from backend.models.base import Base
 
 class User(Base):
@@ -11,4 +12,9 @@ class User(Base):
     phone = Column(String(50))
     email = Column(String(120))
     role = Column(String(50), default='user')
-    is_active = Column(Boolean, default=True)
\ No newline at end of file
+    is_active = Column(Boolean, default=True)
+    applications = relationship(
+        'Application',
+        back_populates='user',
+        order_by='(Application.created_at, Application.id)'
+    )
\ No newline at end of file
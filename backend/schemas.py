@@ -0,0 +1,41 @@
+# backend/schemas.py
+from datetime import datetime
+from typing import Generic, List, Optional, TypeVar
+
+from pydantic import BaseModel, ConfigDict
+
+T = TypeVar('T')
+
+
+class UserOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    telegram_id: int
+    username: Optional[str] = None
+    first_name: Optional[str] = None
+    last_name: Optional[str] = None
+    phone: Optional[str] = None
+    email: Optional[str] = None
+    role: Optional[str] = None
+    is_active: Optional[bool] = None
+
+
+class ApplicationOut(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    id: int
+    user_id: int
+    faculty_code: str
+    status: Optional[str] = None
+    created_at: Optional[datetime] = None
+
+
+class ApplicationStatusUpdate(BaseModel):
+    status: str
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    # Курсор следующей страницы; None — страниц больше нет
+    next_cursor: Optional[str] = None
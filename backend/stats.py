@@ -0,0 +1,100 @@
+# backend/stats.py
+import asyncio
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, func, Date
+
+from backend.models.application import Application
+from backend.models.application_stat import ApplicationStat
+
+
+def _stats_insert(conn):
+    if conn.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(ApplicationStat)
+
+
+def reconcile_application_stats(conn):
+    """
+    Сверяет счетчики application_stats с таблицей applications и чинит расхождения.
+
+    Каждый расходящийся счетчик пересчитывается одним upsert с подзапросом
+    COUNT, поэтому параллельная подача заявок не приводит к потере инкремента.
+    Возвращает число исправленных счетчиков.
+    """
+    day = func.date(Application.created_at, type_=Date)
+    actual = {
+        (row.faculty_code, row.status, row.day): row.count
+        for row in conn.execute(
+            select(Application.faculty_code, Application.status, day.label('day'), func.count().label('count'))
+            .group_by(Application.faculty_code, Application.status, day)
+        )
+    }
+    stored = {
+        (row.faculty_code, row.status, row.day): row.count
+        for row in conn.execute(select(ApplicationStat))
+    }
+
+    mismatched = [key for key in actual.keys() | stored.keys() if actual.get(key, 0) != stored.get(key, 0)]
+    for faculty_code, status, stat_day in mismatched:
+        recount = (
+            select(func.count())
+            .where(
+                Application.faculty_code == faculty_code,
+                Application.status == status,
+                day == stat_day,
+            )
+            .scalar_subquery()
+        )
+        stmt = _stats_insert(conn).values(faculty_code=faculty_code, status=status, day=stat_day, count=recount)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[ApplicationStat.faculty_code, ApplicationStat.status, ApplicationStat.day],
+            set_={'count': stmt.excluded.count},
+        )
+        conn.execute(stmt)
+    if mismatched:
+        print(f"📊 Исправлено счетчиков заявок: {len(mismatched)}")
+    return len(mismatched)
+
+
+async def reconcile_periodically(engine, interval):
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            async with engine.begin() as conn:
+                await conn.run_sync(reconcile_application_stats)
+        except Exception as e:
+            print(f"❌ Ошибка сверки счетчиков заявок: {e}")
+
+
+async def load_faculty_stats(session, days=14):
+    """Сводка по счетчикам: стоимость не зависит от числа заявок."""
+    totals = await session.execute(
+        select(ApplicationStat.faculty_code, ApplicationStat.status, func.sum(ApplicationStat.count))
+        .group_by(ApplicationStat.faculty_code, ApplicationStat.status)
+    )
+    by_faculty = {}
+    total = 0
+    for faculty_code, status, count in totals:
+        if not count:
+            continue
+        faculty = by_faculty.setdefault(faculty_code, {'total': 0, 'by_status': {}})
+        faculty['by_status'][status] = count
+        faculty['total'] += count
+        total += count
+
+    # Дни счетчиков считаются в UTC (CURRENT_TIMESTAMP и utcnow), как и created_at
+    since = datetime.utcnow().date() - timedelta(days=days - 1)
+    daily = await session.execute(
+        select(ApplicationStat.day, func.sum(ApplicationStat.count))
+        .where(ApplicationStat.day >= since)
+        .group_by(ApplicationStat.day)
+        .order_by(ApplicationStat.day)
+    )
+    return {
+        'total': total,
+        'by_faculty': by_faculty,
+        'by_day': [{'day': day.isoformat(), 'count': count} for day, count in daily if count],
+    }
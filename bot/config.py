@@ -6,8 +6,57 @@ load_dotenv()
 class Config:
     BOT_TOKEN = os.getenv("BOT_TOKEN")
     DATABASE_URL = os.getenv("DATABASE_URL", "sqlite+aiosqlite:///tusur.db")
+    DATABASE_READ_URL = os.getenv("DATABASE_READ_URL", "")
+    DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "5"))
+    DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "5"))
+    DB_READ_POOL_SIZE = int(os.getenv("DB_READ_POOL_SIZE", "10"))
+    DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))
+    DB_QUERY_CACHE_SIZE = int(os.getenv("DB_QUERY_CACHE_SIZE", "500"))
+    SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+    SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+    SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
+    SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+    SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-20000"))
+    USER_WRITE_BATCH_SIZE = int(os.getenv("USER_WRITE_BATCH_SIZE", "200"))
+    USER_WRITE_FLUSH_INTERVAL = float(os.getenv("USER_WRITE_FLUSH_INTERVAL", "1.0"))
+    USER_TOUCH_CACHE_SIZE = int(os.getenv("USER_TOUCH_CACHE_SIZE", "100000"))
+    USER_CACHE_SIZE = int(os.getenv("USER_CACHE_SIZE", "10000"))
+    USER_CACHE_TTL = float(os.getenv("USER_CACHE_TTL", "300"))
+    FSM_WRITE_DELAY = float(os.getenv("FSM_WRITE_DELAY", "0.5"))
+    FSM_SESSION_TTL = float(os.getenv("FSM_SESSION_TTL", str(24 * 3600)))
+    FSM_SWEEP_INTERVAL = float(os.getenv("FSM_SWEEP_INTERVAL", "600"))
     DEBUG = os.getenv("DEBUG", "False") == "True"
     ADMIN_USER_ID = int(os.getenv("ADMIN_USER_ID", "0"))
+    ADMIN_API_TOKEN = os.getenv("ADMIN_API_TOKEN", "")
+    STATS_RECONCILE_INTERVAL = float(os.getenv("STATS_RECONCILE_INTERVAL", "3600"))
+
+    RUN_MODE = os.getenv("RUN_MODE", "polling")
+    WEBHOOK_BASE_URL = os.getenv("WEBHOOK_BASE_URL", "")
+    WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "/webhook")
+    WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+    WEBHOOK_HOST = os.getenv("WEBHOOK_HOST", "0.0.0.0")
+    WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8080"))
+    WEBHOOK_MAX_IN_FLIGHT = int(os.getenv("WEBHOOK_MAX_IN_FLIGHT", "100"))
+    WEBHOOK_MAX_CONNECTIONS = int(os.getenv("WEBHOOK_MAX_CONNECTIONS", "40"))
+    WEBHOOK_DRAIN_TIMEOUT = float(os.getenv("WEBHOOK_DRAIN_TIMEOUT", "25"))
+    BOT_WORKERS = int(os.getenv("BOT_WORKERS", str(os.cpu_count() or 2)))
+    WORKER_MAX_IN_FLIGHT = int(os.getenv("WORKER_MAX_IN_FLIGHT", "100"))
+    WORKER_REPORT_INTERVAL = float(os.getenv("WORKER_REPORT_INTERVAL", "60"))
+    WORKER_STOP_TIMEOUT = float(os.getenv("WORKER_STOP_TIMEOUT", "30"))
+    TELEGRAM_API_URL = os.getenv("TELEGRAM_API_URL", "")
+    TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "30"))
+    TG_GLOBAL_BURST = float(os.getenv("TG_GLOBAL_BURST", "30"))
+    TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))
+    TG_CHAT_BURST = float(os.getenv("TG_CHAT_BURST", "5"))
+    TG_GROUP_RATE = float(os.getenv("TG_GROUP_RATE", str(20 / 60)))
+    TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "3"))
+    EDIT_DEBOUNCE_MS = float(os.getenv("EDIT_DEBOUNCE_MS", "300"))
+
+    ML_BATCH_SIZE = int(os.getenv("ML_BATCH_SIZE", "32"))
+    ML_BATCH_WAIT_MS = float(os.getenv("ML_BATCH_WAIT_MS", "10"))
+    LEMMA_CACHE_SIZE = int(os.getenv("LEMMA_CACHE_SIZE", "10000"))
+    PREDICTION_CACHE_SIZE = int(os.getenv("PREDICTION_CACHE_SIZE", "50000"))
+    PREDICTION_CACHE_FILE = os.getenv("PREDICTION_CACHE_FILE", "")
 
     FACULTIES = {
         "РТФ": "Радиотехнический факультет",
@@ -0,0 +1,77 @@
+from bot.data.subjects import SCHOOL_SUBJECTS, EXAM_SUBJECTS
+
+# Выбор предметов хранится в FSM целым числом: бит i — i-й предмет словаря.
+# Порядок SCHOOL_SUBJECTS совпадает с порядком признаков модели, поэтому
+# маска раскладывается в вектор признаков без перекодирования.
+SUBJECT_CODES = {
+    'school': tuple(SCHOOL_SUBJECTS),
+    'exam': tuple(EXAM_SUBJECTS),
+}
+SUBJECT_BITS = {
+    subject_type: {code: i for i, code in enumerate(codes)}
+    for subject_type, codes in SUBJECT_CODES.items()
+}
+
+# Бит экзамена -> бит школьного предмета; экзамены без пары
+# (например, «математика_база») в признаки модели не попадают
+EXAM_TO_SCHOOL_BIT = tuple(
+    SUBJECT_BITS['school'].get(code.replace('_ege', '').replace('_oge', ''))
+    for code in SUBJECT_CODES['exam']
+)
+
+
+def bit_index(subject_type, code):
+    return SUBJECT_BITS[subject_type].get(code)
+
+
+def toggle(mask, subject_type, code):
+    index = bit_index(subject_type, code)
+    if index is None:
+        raise KeyError(code)
+    return mask ^ (1 << index)
+
+
+def is_selected(mask, index):
+    return mask >> index & 1 == 1
+
+
+def count(mask):
+    return bin(mask).count('1')
+
+
+def iter_bits(mask):
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def to_mask(subject_type, selected):
+    """Маска из маски или из списка кодов (сессии, сохраненные до перехода на маски)."""
+    if isinstance(selected, int):
+        return selected
+    mask = 0
+    for code in selected or ():
+        index = bit_index(subject_type, code)
+        if index is not None:
+            mask |= 1 << index
+    return mask
+
+
+def to_codes(subject_type, selected):
+    codes = SUBJECT_CODES[subject_type]
+    return [codes[i] for i in iter_bits(to_mask(subject_type, selected)) if i < len(codes)]
+
+
+def contains(subject_type, selected, code):
+    index = bit_index(subject_type, code)
+    return index is not None and is_selected(to_mask(subject_type, selected), index)
+
+
+def exams_to_school_mask(exam_mask):
+    mask = 0
+    for i in iter_bits(exam_mask):
+        school_bit = EXAM_TO_SCHOOL_BIT[i] if i < len(EXAM_TO_SCHOOL_BIT) else None
+        if school_bit is not None:
+            mask |= 1 << school_bit
+    return mask
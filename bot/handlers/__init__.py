@@ -4,3 +4,4 @@ from .common_handlers import router as common_handlers
 from .applications import router as applications
 from .profile import router as profile
 from .help import router as help
+from .admin import router as admin
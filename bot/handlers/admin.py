@@ -0,0 +1,66 @@
+from html import escape
+
+from aiogram import Router, F
+from aiogram.filters import Command
+from aiogram.types import Message
+
+from backend.stats import load_faculty_stats
+from bot.config import Config
+from bot.utils.database import read_session
+from bot.utils.ml_model import model_status
+
+TRAINING_STAGES = {
+    'starting': 'запуск',
+    'generating': 'генерация данных',
+    'training': 'обучение',
+    'trained': 'проверка',
+    'saving': 'сохранение',
+    'done': 'завершено',
+    'failed': 'ошибка',
+}
+
+router = Router()
+router.message.filter(F.from_user.id == Config.ADMIN_USER_ID)
+
+
+@router.message(Command("stats"))
+async def show_stats(message: Message):
+    async with read_session() as session:
+        stats = await load_faculty_stats(session, days=7)
+
+    if not stats['total']:
+        await message.answer("📊 Заявок пока нет.")
+        return
+
+    lines = [f"📊 <b>Всего заявок:</b> {stats['total']}\n"]
+    for faculty_code, faculty in sorted(stats['by_faculty'].items(), key=lambda item: -item[1]['total']):
+        statuses = ", ".join(f"{status}: {count}" for status, count in faculty['by_status'].items())
+        lines.append(f"• <b>{faculty_code}</b> — {faculty['total']} ({statuses})")
+    if stats['by_day']:
+        lines.append("\n<b>По дням (7 дней):</b>")
+        lines += [f"{item['day']}: {item['count']}" for item in stats['by_day']]
+    await message.answer("\n".join(lines), parse_mode="HTML")
+
+
+@router.message(Command("model"))
+async def show_model_status(message: Message):
+    status = model_status()
+    if status['ready']:
+        lines = [f"🤖 <b>Модель:</b> {status['model_version']}"]
+    else:
+        lines = ["🤖 <b>Модель:</b> не загружена, работает простая логика"]
+
+    training = status['training']
+    if training is None:
+        lines.append("🧠 Обучение не запускалось")
+    else:
+        stage = TRAINING_STAGES.get(training['stage'], training['stage'])
+        line = f"🧠 <b>Обучение:</b> {stage}"
+        if 'percent' in training:
+            line += f", эпоха {training['epoch']}/{training['epochs']} ({training['percent']}%)"
+        if 'duration' in training:
+            line += f", {training['duration']} с"
+        if training.get('error'):
+            line += f"\n{escape(training['error'])}"
+        lines.append(line)
+    await message.answer("\n".join(lines), parse_mode="HTML")
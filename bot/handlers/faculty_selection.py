@@ -5,10 +5,12 @@ from aiogram.fsm.state import State, StatesGroup
 
 from bot.config import Config
 from bot.keyboards.main_menu import get_faculty_choose_keyboard, get_main_menu
-from bot.keyboards.subjects_keyboard import get_subjects_keyboard, get_confirm_subjects_keyboard
+from bot.keyboards.subjects_keyboard import get_subjects_keyboard, get_confirm_subjects_keyboard, decode_subject_callback
 from bot.data.subjects import SCHOOL_SUBJECTS, EXAM_SUBJECTS
-from bot.utils.ml_model import get_faculty_recommendation
-from bot.utils.database import get_user_by_telegram_id, add_application, create_or_update_user
+from bot.data import subject_masks
+from bot.utils.ml_model import get_faculty_recommendation, build_ml_input
+from bot.utils.message_edits import edit_coordinator
+from bot.utils.database import get_user_by_telegram_id, submit_application, save_questionnaire
 import re
 
 
@@ -39,7 +41,7 @@ class FacultySelection(StatesGroup):
 @router.message(F.text == "🎓 Подобрать факультет")
 async def start_faculty_selection(message: Message, state: FSMContext):
     await state.set_state(FacultySelection.selecting_favorite_subjects)
-    await state.update_data(selected_favorite_subjects=[])
+    await state.update_data(selected_favorite_subjects=0)
 
     text = (
         "Давай подберем тебе подходящий факультет ТУСУР! 🎯\n\n"
@@ -48,19 +50,18 @@ async def start_faculty_selection(message: Message, state: FSMContext):
         "Можно несколько.\n\n"
         "⚠️ <b>Минимум 1 предмет должен быть выбран</b>"
     )
-    keyboard = get_subjects_keyboard('school', [])
+    keyboard = get_subjects_keyboard('school', 0)
     await message.answer(text, reply_markup=keyboard, parse_mode="HTML")
 
 
-@router.callback_query(F.data.startswith("subject_"))
+@router.callback_query(F.data.startswith("st:") | F.data.startswith("subject_"))
 async def toggle_subject_selection(callback: CallbackQuery, state: FSMContext):
-    data_parts = callback.data.split("_")
-    if len(data_parts) < 3:
+    decoded = decode_subject_callback(callback.data)
+    if decoded is None:
         await callback.answer("Ошибка формата данных", show_alert=True)
         return
 
-    subject_type = data_parts[1]
-    subject_code = "_".join(data_parts[2:])
+    subject_type, subject_index = decoded
     current_state = await state.get_state()
     state_data = await state.get_data()
 
@@ -78,22 +79,10 @@ async def toggle_subject_selection(callback: CallbackQuery, state: FSMContext):
         await callback.answer("Этот выбор неактуален сейчас.", show_alert=True)
         return
 
-    selected_subjects = state_data.get(selected_key, []).copy()
-    if subject_code in selected_subjects:
-        selected_subjects.remove(subject_code)
-    else:
-        selected_subjects.append(subject_code)
-
-    await state.update_data({selected_key: selected_subjects})
-
-    keyboard = get_subjects_keyboard(subject_type, selected_subjects)
-
-    try:
-        await callback.message.edit_reply_markup(reply_markup=keyboard)
-    except:
-        await callback.message.delete()
-        await callback.message.answer(callback.message.text, reply_markup=keyboard, parse_mode="HTML")
+    selected = subject_masks.to_mask(subject_type, state_data.get(selected_key, 0)) ^ (1 << subject_index)
+    await state.update_data({selected_key: selected})
 
+    edit_coordinator.edit_markup(callback.message, get_subjects_keyboard(subject_type, selected))
     await callback.answer()
 
 
@@ -103,7 +92,7 @@ async def favorite_subjects_done(callback: CallbackQuery, state: FSMContext):
     current_state = await state.get_state()
 
     if current_state == FacultySelection.selecting_favorite_subjects.state:
-        selected_subjects = state_data.get('selected_favorite_subjects', [])
+        selected_subjects = subject_masks.to_codes('school', state_data.get('selected_favorite_subjects', 0))
         if not selected_subjects:
             await callback.answer("Выберите хотя бы один предмет!", show_alert=True)
             return
@@ -113,11 +102,12 @@ async def favorite_subjects_done(callback: CallbackQuery, state: FSMContext):
                 "\n".join(subjects_text) +
                 f"\n\n<b>Всего выбрано:</b> {len(selected_subjects)} предм."
         )
+        await edit_coordinator.discard(callback.message)
         keyboard = get_confirm_subjects_keyboard('favorite')
         await callback.message.edit_text(confirmation_text, reply_markup=keyboard, parse_mode="HTML")
 
     elif current_state == FacultySelection.selecting_disliked_subjects.state:
-        selected_subjects = state_data.get('selected_disliked_subjects', [])
+        selected_subjects = subject_masks.to_codes('school', state_data.get('selected_disliked_subjects', 0))
         if not selected_subjects:
             await callback.answer("Выберите хотя бы один предмет!", show_alert=True)
             return
@@ -127,6 +117,7 @@ async def favorite_subjects_done(callback: CallbackQuery, state: FSMContext):
                 "\n".join(subjects_text) +
                 f"\n\n<b>Всего выбрано:</b> {len(selected_subjects)} предм."
         )
+        await edit_coordinator.discard(callback.message)
         keyboard = get_confirm_subjects_keyboard('disliked')
         await callback.message.edit_text(confirmation_text, reply_markup=keyboard, parse_mode="HTML")
 
@@ -136,7 +127,7 @@ async def favorite_subjects_done(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "subjects_exam_done")
 async def exams_subjects_done(callback: CallbackQuery, state: FSMContext):
     state_data = await state.get_data()
-    selected_subjects = state_data.get('selected_exams', [])
+    selected_subjects = subject_masks.to_codes('exam', state_data.get('selected_exams', 0))
     if not selected_subjects:
         await callback.answer("Выберите хотя бы один экзамен!", show_alert=True)
         return
@@ -146,6 +137,7 @@ async def exams_subjects_done(callback: CallbackQuery, state: FSMContext):
             "\n".join(subjects_text) +
             f"\n\n<b>Всего выбрано:</b> {len(selected_subjects)} экзам."
     )
+    await edit_coordinator.discard(callback.message)
     keyboard = get_confirm_subjects_keyboard('exams')
     await callback.message.edit_text(confirmation_text, reply_markup=keyboard, parse_mode="HTML")
     await callback.answer()
@@ -154,7 +146,7 @@ async def exams_subjects_done(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "confirm_favorite_subjects")
 async def confirm_favorite_subjects(callback: CallbackQuery, state: FSMContext):
     await state.set_state(FacultySelection.selecting_disliked_subjects)
-    await state.update_data(selected_disliked_subjects=[])
+    await state.update_data(selected_disliked_subjects=0)
     text = (
         "Отлично! 👍\n\n"
         "<b>2/5: Нелюбимые предметы в школе</b>\n\n"
@@ -162,7 +154,7 @@ async def confirm_favorite_subjects(callback: CallbackQuery, state: FSMContext):
         "Это поможет исключить неподходящие направления.\n\n"
         "⚠️ <b>Минимум 1 предмет должен быть выбран</b>"
     )
-    keyboard = get_subjects_keyboard('school', [])
+    keyboard = get_subjects_keyboard('school', 0)
     await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
     await callback.answer()
 
@@ -170,7 +162,7 @@ async def confirm_favorite_subjects(callback: CallbackQuery, state: FSMContext):
 @router.callback_query(F.data == "confirm_disliked_subjects")
 async def confirm_disliked_subjects(callback: CallbackQuery, state: FSMContext):
     await state.set_state(FacultySelection.selecting_exams)
-    await state.update_data(selected_exams=[])
+    await state.update_data(selected_exams=0)
     text = (
         "Понятно! 📝\n\n"
         "<b>3/5: Планируемые экзамены</b>\n\n"
@@ -178,7 +170,7 @@ async def confirm_disliked_subjects(callback: CallbackQuery, state: FSMContext):
         "Какие экзамены ты планируешь сдавать или уже сдал?\n\n"
         "⚠️ <b>Минимум 1 экзамен должен быть выбран</b>"
     )
-    keyboard = get_subjects_keyboard('exam', [])
+    keyboard = get_subjects_keyboard('exam', 0)
     await callback.message.edit_text(text, reply_markup=keyboard, parse_mode="HTML")
     await callback.answer()
 
@@ -204,7 +196,7 @@ async def edit_subjects_selection(callback: CallbackQuery, state: FSMContext):
 
     if edit_type == 'favorite':
         await state.set_state(FacultySelection.selecting_favorite_subjects)
-        selected = state_data.get('selected_favorite_subjects', [])
+        selected = state_data.get('selected_favorite_subjects', 0)
         subject_type = 'school'
         text = (
             "<b>1/5: Любимые предметы в школе</b>\n\n"
@@ -213,7 +205,7 @@ async def edit_subjects_selection(callback: CallbackQuery, state: FSMContext):
         )
     elif edit_type == 'disliked':
         await state.set_state(FacultySelection.selecting_disliked_subjects)
-        selected = state_data.get('selected_disliked_subjects', [])
+        selected = state_data.get('selected_disliked_subjects', 0)
         subject_type = 'school'
         text = (
             "<b>2/5: Нелюбимые предметы в школе</b>\n\n"
@@ -222,7 +214,7 @@ async def edit_subjects_selection(callback: CallbackQuery, state: FSMContext):
         )
     else:  # exams
         await state.set_state(FacultySelection.selecting_exams)
-        selected = state_data.get('selected_exams', [])
+        selected = state_data.get('selected_exams', 0)
         subject_type = 'exam'
         text = (
             "<b>3/5: Планируемые экзамены</b>\n\n"
@@ -254,21 +246,25 @@ async def process_dislikes_and_recommend(message: Message, state: FSMContext):
     user_data = await state.get_data()
     ml_data = {
         'favorite_subjects': ", ".join([
-            SCHOOL_SUBJECTS.get(code, code) for code in user_data.get('selected_favorite_subjects', [])
+            SCHOOL_SUBJECTS[code] for code in subject_masks.to_codes('school', user_data.get('selected_favorite_subjects', 0))
         ]),
         'disliked_subjects': ", ".join([
-            SCHOOL_SUBJECTS.get(code, code) for code in user_data.get('selected_disliked_subjects', [])
+            SCHOOL_SUBJECTS[code] for code in subject_masks.to_codes('school', user_data.get('selected_disliked_subjects', 0))
         ]),
         'exams': ", ".join([
-            EXAM_SUBJECTS.get(code, code) for code in user_data.get('selected_exams', [])
+            EXAM_SUBJECTS[code] for code in subject_masks.to_codes('exam', user_data.get('selected_exams', 0))
         ]),
         'interests': user_data.get('interests', ''),
         'dislikes': user_data.get('dislikes', ''),
-        'selected_favorite_subjects': user_data.get('selected_favorite_subjects', []),
-        'selected_disliked_subjects': user_data.get('selected_disliked_subjects', []),
-        'selected_exams': user_data.get('selected_exams', [])
+        'selected_favorite_subjects': user_data.get('selected_favorite_subjects', 0),
+        'selected_disliked_subjects': user_data.get('selected_disliked_subjects', 0),
+        'selected_exams': user_data.get('selected_exams', 0)
     }
     recommended_faculty = await get_faculty_recommendation(ml_data)
+    try:
+        await save_questionnaire(message.from_user.id, build_ml_input(ml_data), recommended_faculty)
+    except Exception as e:
+        print(f"Ошибка сохранения анкеты: {e}")
     await state.update_data(
         recommended_faculty_code=recommended_faculty.get('code'),
         recommended_faculty_text=recommended_faculty.get('name'),
@@ -371,7 +367,7 @@ async def contacts_confirmed_callback(callback: CallbackQuery, state: FSMContext
 async def change_subjects_from_confirm(callback: CallbackQuery, state: FSMContext):
     await state.set_state(FacultySelection.selecting_favorite_subjects)
     data = await state.get_data()
-    selected = data.get('selected_favorite_subjects', [])
+    selected = data.get('selected_favorite_subjects', 0)
 
     text = (
         "<b>1/5: Любимые предметы в школе</b>\n\n"
@@ -449,36 +445,33 @@ async def finish_contacts_and_confirm(message: Message, state: FSMContext):
 async def submit_application_callback(callback: CallbackQuery, state: FSMContext):
     try:
         data = await state.get_data()
-        user = await get_user_by_telegram_id(callback.from_user.id)
-
-        if not user:
-            user = await create_or_update_user(
-                telegram_id=callback.from_user.id,
-                username=callback.from_user.username,
-                first_name=callback.from_user.first_name,
-                last_name=callback.from_user.last_name,
-                phone=data.get("phone"),
-                email=data.get("email")
-            )
-        else:
-            await create_or_update_user(
-                telegram_id=callback.from_user.id,
-                username=callback.from_user.username,
-                first_name=callback.from_user.first_name,
-                last_name=callback.from_user.last_name,
-                phone=data.get("phone"),
-                email=data.get("email")
-            )
-
         faculty_code = data.get("selected_faculty_code")
         if not faculty_code:
             await callback.answer("Ошибка: факультет не выбран.", show_alert=True)
             return
 
-        await add_application(user.id, faculty_code)
+        _, application_id = await submit_application(
+            telegram_id=callback.from_user.id,
+            username=callback.from_user.username,
+            first_name=callback.from_user.first_name,
+            last_name=callback.from_user.last_name,
+            phone=data.get("phone"),
+            email=data.get("email"),
+            faculty_code=faculty_code
+        )
         await state.clear()
 
         faculty_name = Config.FACULTIES.get(faculty_code, faculty_code)
+        if application_id is None:
+            await callback.message.edit_text(
+                f"ℹ️ Заявка на факультет <b>{faculty_name}</b> уже была подана ранее.",
+                reply_markup=None,
+                parse_mode="HTML"
+            )
+            await callback.message.answer("Выберите действие:", reply_markup=get_main_menu())
+            await callback.answer()
+            return
+
         await callback.message.edit_text(
             f"🎉 Ваша заявка на факультет <b>{faculty_name}</b> успешно подана!\n"
             "В ближайшее время с вами свяжутся сотрудники приемной комиссии.",
@@ -501,6 +494,7 @@ async def submit_application_callback(callback: CallbackQuery, state: FSMContext
 
 @router.callback_query(F.data == "main_menu")
 async def return_to_main_menu(callback: CallbackQuery, state: FSMContext):
+    await edit_coordinator.discard(callback.message)
     await state.clear()
     await callback.message.edit_text("Возвращаемся в главное меню.")
     await callback.message.answer(
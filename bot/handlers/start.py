@@ -4,7 +4,7 @@ from aiogram.types import Message
 from aiogram.fsm.context import FSMContext
 
 from bot.keyboards.main_menu import get_main_menu
-from bot.utils.database import create_or_update_user
+from bot.utils.user_writes import user_write_buffer
 
 router = Router()
 
@@ -12,7 +12,7 @@ router = Router()
 async def start_command(message: Message, state: FSMContext):
     await state.clear()
 
-    user = await create_or_update_user(
+    user_write_buffer.touch(
         telegram_id=message.from_user.id,
         username=message.from_user.username,
         first_name=message.from_user.first_name,
@@ -1,42 +1,104 @@
+from functools import lru_cache
+
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
 from bot.data.subjects import SCHOOL_SUBJECTS, EXAM_SUBJECTS
+from bot.data import subject_masks
+
+SUBJECT_CALLBACK_PREFIX = "st"
+# Короткие id типов в callback data: "st:s:12" вместо "subject_school_обществознание"
+_TYPE_IDS = {'school': 's', 'exam': 'e'}
+_TYPES_BY_ID = {type_id: subject_type for subject_type, type_id in _TYPE_IDS.items()}
+ROW_SIZE = 2
+
+
+def _compile_rows(subject_type, subjects_dict):
+    """
+    Для каждого ряда из ROW_SIZE кнопок заранее собираются все варианты
+    отметок: вариант выбирается по битам маски этого ряда.
+    """
+    buttons = [
+        (
+            InlineKeyboardButton(text=name, callback_data=f"{SUBJECT_CALLBACK_PREFIX}:{_TYPE_IDS[subject_type]}:{i}"),
+            InlineKeyboardButton(text=f"✅ {name}", callback_data=f"{SUBJECT_CALLBACK_PREFIX}:{_TYPE_IDS[subject_type]}:{i}"),
+        )
+        for i, name in enumerate(subjects_dict.values())
+    ]
+    rows = []
+    for start in range(0, len(buttons), ROW_SIZE):
+        row_buttons = buttons[start:start + ROW_SIZE]
+        rows.append(tuple(
+            [variants[state >> offset & 1] for offset, variants in enumerate(row_buttons)]
+            for state in range(1 << len(row_buttons))
+        ))
+    return tuple(rows)
+
 
-def get_subjects_keyboard(subject_type: str, selected_subjects: list = None) -> InlineKeyboardMarkup:
-    if selected_subjects is None:
-        selected_subjects = []
-    subjects_dict = SCHOOL_SUBJECTS if subject_type == 'school' else EXAM_SUBJECTS
-    keyboard = InlineKeyboardMarkup(inline_keyboard=[])
-    subjects = list(subjects_dict.items())
-    for i in range(0, len(subjects), 2):
-        row = []
-        for j in range(2):
-            if i + j >= len(subjects):
-                break
-            code, name = subjects[i + j]
-            checked = "✅ " if code in selected_subjects else ""
-            row.append(InlineKeyboardButton(
-                text=f"{checked}{name}",
-                callback_data=f"subject_{subject_type}_{code}"
-            ))
-        keyboard.inline_keyboard.append(row)
-    count = len(selected_subjects)
-    control_row = [InlineKeyboardButton(
+_ROWS = {
+    'school': _compile_rows('school', SCHOOL_SUBJECTS),
+    'exam': _compile_rows('exam', EXAM_SUBJECTS),
+}
+_MAIN_MENU_ROW = [InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")]
+_EMPTY_SELECTION_ROW = [InlineKeyboardButton(text="❌ Выберите хотя бы 1 предмет", callback_data="ignore")]
+
+
+@lru_cache(maxsize=None)
+def _footer(subject_type, count):
+    rows = [[InlineKeyboardButton(
         text=f"Выбрано: {count}" + (" (мин. 1)" if count == 0 else ""),
         callback_data="ignore"
-    )]
-    keyboard.inline_keyboard.append(control_row)
+    )]]
     if count > 0:
-        keyboard.inline_keyboard.append([
-            InlineKeyboardButton(text="➡️ Далее", callback_data=f"subjects_{subject_type}_done")
-        ])
+        rows.append([InlineKeyboardButton(text="➡️ Далее", callback_data=f"subjects_{subject_type}_done")])
     else:
-        keyboard.inline_keyboard.append([
-            InlineKeyboardButton(text="❌ Выберите хотя бы 1 предмет", callback_data="ignore")
-        ])
-    keyboard.inline_keyboard.append([
-        InlineKeyboardButton(text="🏠 Главное меню", callback_data="main_menu")
-    ])
-    return keyboard
+        rows.append(_EMPTY_SELECTION_ROW)
+    rows.append(_MAIN_MENU_ROW)
+    return tuple(rows)
+
+
+@lru_cache(maxsize=4096)
+def _build_subjects_keyboard(subject_type, selected_mask):
+    row_mask = (1 << ROW_SIZE) - 1
+    rows = [
+        variants[selected_mask >> (i * ROW_SIZE) & row_mask]
+        for i, variants in enumerate(_ROWS[subject_type])
+    ]
+    rows += _footer(subject_type, subject_masks.count(selected_mask))
+    return InlineKeyboardMarkup(inline_keyboard=rows)
+
+
+def get_subjects_keyboard(subject_type: str, selected_mask: int = 0) -> InlineKeyboardMarkup:
+    """
+    Клавиатура выбора предметов по маске выбора.
+
+    Разметка собирается из заранее созданных кнопок и кэшируется по
+    (тип, маска): возвращаемый объект общий, изменять его нельзя.
+    """
+    return _build_subjects_keyboard(subject_type, subject_masks.to_mask(subject_type, selected_mask))
+
+
+def decode_subject_callback(data: str):
+    """(subject_type, индекс предмета) из callback data или None."""
+    if data.startswith(f"{SUBJECT_CALLBACK_PREFIX}:"):
+        parts = data.split(":")
+        if len(parts) != 3 or parts[1] not in _TYPES_BY_ID or not parts[2].isdigit():
+            return None
+        subject_type = _TYPES_BY_ID[parts[1]]
+        index = int(parts[2])
+    elif data.startswith("subject_"):
+        # Кнопки в сообщениях, отправленных до перехода на короткие id
+        parts = data.split("_", 2)
+        if len(parts) < 3 or parts[1] not in _TYPE_IDS:
+            return None
+        subject_type = parts[1]
+        index = subject_masks.bit_index(subject_type, parts[2])
+        if index is None:
+            return None
+    else:
+        return None
+    if index >= len(subject_masks.SUBJECT_CODES[subject_type]):
+        return None
+    return subject_type, index
+
 
 def get_confirm_subjects_keyboard(subject_type: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(inline_keyboard=[
@@ -52,4 +114,4 @@ def get_confirm_subjects_keyboard(subject_type: str) -> InlineKeyboardMarkup:
             text="🏠 Главное меню",
             callback_data="main_menu"
         )]
-    ])
\ No newline at end of file
+    ])
@@ -1,12 +1,14 @@
+# Таймер создается первым, чтобы замерить импорт остальных модулей
+from bot.utils.startup_timing import startup_timer
+
 import asyncio
 import logging
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from bot.utils.database import engine
-from backend.models.base import Base
 from bot.config import Config
-from bot.utils.database import engine, Base
+from bot.utils.database import engine
+from backend.migrations import migrate
 
 from bot.handlers import (
     start,
@@ -14,40 +16,109 @@ from bot.handlers import (
     applications,
     profile,
     help,
+    admin,
     common_handlers
 )
 
-async def on_startup():
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
+startup_timer.mark_since_start("импорт модулей")
+
+
+async def init_db():
+    with startup_timer.phase("инициализация БД"):
+        await migrate(engine)
     logging.info("✅ База данных готова!")
 
-    from bot.utils.ml_model import initialize_ml_model
-    await initialize_ml_model()
+_background_tasks = []
 
-async def main():
-    logging.basicConfig(level=logging.INFO)
-    if not Config.BOT_TOKEN:
-        logging.error("BOT_TOKEN не задан.")
-        return
+def start_stats_reconcile():
+    from backend.stats import reconcile_periodically
+    _background_tasks.append(
+        asyncio.create_task(reconcile_periodically(engine, Config.STATS_RECONCILE_INTERVAL))
+    )
+
+async def on_startup():
+    # В режиме supervisor сверку счетчиков и обучение модели ведет супервизор,
+    # а не каждый из воркеров
+    supervised = Config.RUN_MODE == "supervisor"
+    if not supervised:
+        start_stats_reconcile()
+    # Модель грузится в фоне: бот начинает принимать обновления сразу
+    from bot.utils.ml_model import start_ml_warm_up
+    start_ml_warm_up(train_if_missing=not supervised)
+    startup_timer.report("Бот принимает обновления через")
+
+async def on_shutdown():
+    for task in _background_tasks:
+        task.cancel()
+    from bot.utils.user_writes import user_write_buffer
+    await user_write_buffer.stop()
+    logging.info(f"📊 Буфер записи профилей: {user_write_buffer.stats()}")
+    from bot.utils.user_cache import user_cache
+    logging.info(f"📊 Кэш пользователей: {user_cache.stats()}")
+    from bot.utils.message_edits import edit_coordinator
+    logging.info(f"📊 Правки клавиатур: {edit_coordinator.stats()}")
+    from bot.utils.rate_limiter import outbound_limiter
+    logging.info(f"📊 Очередь запросов к Bot API: {outbound_limiter.stats()}")
+    await outbound_limiter.close()
 
-    await on_startup()
+    from bot.utils import ml_model
+    logging.info(f"📊 Статистика ML-инференса: {ml_model.inference_service.stats()}")
+    await ml_model.inference_service.stop()
+    if ml_model.ml_ready:
+        from bot.ml.prediction_cache import prediction_cache
+        logging.info(f"📊 Кэш рекомендаций: {prediction_cache.stats()}")
+        prediction_cache.save()
 
-    bot = Bot(
+def create_bot():
+    from bot.utils.rate_limiter import create_bot_session
+    return Bot(
         token=Config.BOT_TOKEN,
+        session=create_bot_session(),
         default=DefaultBotProperties(parse_mode=ParseMode.HTML)
     )
-    dp = Dispatcher()
+
+def create_dispatcher():
+    from bot.utils.fsm_storage import create_fsm_storage
+    dp = Dispatcher(storage=create_fsm_storage())
+    dp.startup.register(on_startup)
+    dp.shutdown.register(on_shutdown)
     dp.include_router(start)
     dp.include_router(faculty_selection)
     dp.include_router(applications)
     dp.include_router(profile)
     dp.include_router(help)
+    dp.include_router(admin)
     dp.include_router(common_handlers)
-    logging.info("🚀 Бот запущен.")
-    async with engine.begin() as conn:
-        await conn.run_sync(Base.metadata.create_all)
-    await dp.start_polling(bot)
+    return dp
+
+async def main():
+    logging.basicConfig(level=logging.INFO)
+    if not Config.BOT_TOKEN:
+        logging.error("BOT_TOKEN не задан.")
+        return
+
+    await init_db()
+
+    if Config.RUN_MODE == "supervisor":
+        from bot.utils.workers import run_supervisor
+        logging.info(f"🚀 Бот запущен ({Config.BOT_WORKERS} воркеров).")
+        await run_supervisor()
+        return
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    if Config.RUN_MODE == "webhook":
+        if not Config.WEBHOOK_BASE_URL:
+            logging.error("WEBHOOK_BASE_URL не задан.")
+            return
+        from bot.utils.webhook import run_webhook
+        logging.info("🚀 Бот запущен (webhook).")
+        await run_webhook(dp, bot)
+    else:
+        logging.info("🚀 Бот запущен.")
+        # Для polling webhook должен быть снят, иначе getUpdates вернет ошибку
+        await bot.delete_webhook()
+        await dp.start_polling(bot)
 
 if __name__ == "__main__":
     asyncio.run(main())
@@ -0,0 +1,166 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+
+import numpy as np
+
+from bot.ml.numpy_inference import NumpyDenseModel
+
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 3
+# Файлы модели до перехода на артефакт: pickle sklearn + веса .npz или .keras
+LEGACY_DATA_FILE = "model_data.pkl"
+LEGACY_WEIGHT_FILES = ("model_weights.npz", "tusur_model.keras")
+
+
+class ArtifactError(Exception):
+    pass
+
+
+def _checksum(directory, files):
+    digest = hashlib.sha256()
+    for name in files:
+        with open(directory / name, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+    return digest.hexdigest()
+
+
+def _weight_files(manifest):
+    return [name for layer in manifest['layers'] for name in (layer['kernel'], layer['bias'])]
+
+
+def _feature_layout(subjects, keywords):
+    layout = []
+    offset = 0
+    for name, size in (
+        ('liked_subjects', len(subjects)),
+        ('disliked_subjects', len(subjects)),
+        ('exams', len(subjects)),
+        ('interests', len(keywords)),
+        ('not_interests', len(keywords)),
+    ):
+        layout.append({'name': name, 'offset': offset, 'size': size})
+        offset += size
+    return layout
+
+
+def _write_current(root, version):
+    tmp_file = root / f".{CURRENT_FILE}.tmp-{os.getpid()}"
+    tmp_file.write_text(version + "\n", encoding="utf-8")
+    os.replace(tmp_file, root / CURRENT_FILE)
+
+
+def _prune_versions(root, current):
+    versions = sorted(
+        (p for p in root.iterdir() if p.is_dir() and (p / MANIFEST_FILE).exists() and p.name != current),
+        key=lambda p: p.name,
+    )
+    for old in versions[:max(0, len(versions) - (KEEP_VERSIONS - 1))]:
+        # Уже отображенные в память файлы остаются доступны процессам, которые их держат
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def save_artifact(root, model, subjects, keywords, classes, metrics=None):
+    """
+    Сохраняет модель как новую версию артефакта и делает ее текущей.
+
+    Каталог версии сначала собирается под временным именем, затем
+    переименовывается, а указатель CURRENT заменяется атомарно.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    tmp_dir = root / f".tmp-{os.getpid()}-{time.time_ns()}"
+    tmp_dir.mkdir()
+
+    try:
+        layers = []
+        for i, (kernel, bias, activation) in enumerate(model.layers):
+            layer = {'kernel': f"layer{i}_kernel.npy", 'bias': f"layer{i}_bias.npy", 'activation': activation}
+            np.save(tmp_dir / layer['kernel'], np.ascontiguousarray(kernel, dtype=np.float32))
+            np.save(tmp_dir / layer['bias'], np.ascontiguousarray(bias, dtype=np.float32))
+            layers.append(layer)
+
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'created_at': time.strftime("%Y-%m-%dT%H:%M:%S"),
+            'subjects': list(subjects),
+            'keywords': list(keywords),
+            'classes': list(classes),
+            'feature_layout': _feature_layout(subjects, keywords),
+            'layers': layers,
+            'metrics': metrics or {},
+        }
+        manifest['checksum'] = _checksum(tmp_dir, _weight_files(manifest))
+        manifest['model_version'] = time.strftime("%Y%m%d-%H%M%S-") + manifest['checksum'][:8]
+
+        with open(tmp_dir / MANIFEST_FILE, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+        version_dir = root / manifest['model_version']
+        if version_dir.exists():
+            # Та же секунда и та же контрольная сумма — веса идентичны
+            shutil.rmtree(tmp_dir)
+        else:
+            os.replace(tmp_dir, version_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+    _write_current(root, manifest['model_version'])
+    _prune_versions(root, manifest['model_version'])
+    return manifest
+
+
+def current_version(root):
+    current_file = Path(root) / CURRENT_FILE
+    if not current_file.exists():
+        return None
+    return current_file.read_text(encoding="utf-8").strip() or None
+
+
+def has_legacy_model(root):
+    root = Path(root)
+    return (root / LEGACY_DATA_FILE).exists() and any((root / name).exists() for name in LEGACY_WEIGHT_FILES)
+
+
+def load_artifact(root, mmap=True, verify=False):
+    """
+    Загружает текущую версию артефакта: (NumpyDenseModel, manifest).
+
+    С mmap=True веса отображаются в память только для чтения, и несколько
+    процессов бота делят одни и те же страницы через page cache ОС.
+    """
+    root = Path(root)
+    version = current_version(root)
+    if version is None:
+        raise ArtifactError(f"В {root} нет указателя {CURRENT_FILE}")
+
+    version_dir = root / version
+    with open(version_dir / MANIFEST_FILE, encoding='utf-8') as f:
+        manifest = json.load(f)
+
+    if manifest.get('format_version') != FORMAT_VERSION:
+        raise ArtifactError(f"Неподдерживаемая версия формата: {manifest.get('format_version')}")
+    if verify and _checksum(version_dir, _weight_files(manifest)) != manifest['checksum']:
+        raise ArtifactError(f"Контрольная сумма артефакта {version} не совпадает")
+
+    mmap_mode = 'r' if mmap else None
+    model = NumpyDenseModel([
+        (
+            np.load(version_dir / layer['kernel'], mmap_mode=mmap_mode, allow_pickle=False),
+            np.load(version_dir / layer['bias'], mmap_mode=mmap_mode, allow_pickle=False),
+            layer['activation'],
+        )
+        for layer in manifest['layers']
+    ])
+
+    num_features = sum(part['size'] for part in manifest['feature_layout'])
+    if model.input_dim != num_features or model.output_dim != len(manifest['classes']):
+        raise ArtifactError(f"Размерности весов не соответствуют манифесту {version}")
+    return model, manifest
@@ -0,0 +1,184 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+import numpy as np
+
+from bot.ml.tusur_model import TUSUR_FACULTIES, SCHOOL_SUBJECTS_LIST
+from bot.ml.keyword_index import KeywordIndex
+from bot.ml.lemma_cache import lemma_cache
+
+# Размер шарда фиксирован: каждый шард получает свой SeedSequence, поэтому
+# результат при одном seed не зависит от числа процессов
+CHUNK_SIZE = 1000
+
+ADDITIONAL_EXAMS = ["русский_язык", "математика", "физика", "информатика", "обществознание"]
+
+INTEREST_VARIATIONS = {
+    "программирование": ["программирование", "кодинг", "разработка программ", "написание кода"],
+    "электроника": ["электроника", "электронные устройства", "микроэлектроника"],
+    "управление": ["управление", "менеджмент", "руководство", "администрирование"],
+    "психология": ["психология", "изучение поведения", "работа с людьми"],
+    "радиотехника": ["радиотехника", "радиосвязь", "беспроводные технологии"]
+}
+
+FACULTY_CODES = list(TUSUR_FACULTIES.keys())
+NUM_SUBJECTS = len(SCHOOL_SUBJECTS_LIST)
+SUBJECT_INDEX = {subject: i for i, subject in enumerate(SCHOOL_SUBJECTS_LIST)}
+KEYWORD_PHRASES = [keyword for info in TUSUR_FACULTIES.values() for keyword in info["keywords"]]
+
+
+def _pool_matrix(pools, index):
+    # Матрица (факультеты, макс. размер пула) с индексами элементов, -1 — пустые места
+    width = max(len(pool) for pool in pools)
+    matrix = np.full((len(pools), width), -1, dtype=np.int64)
+    for i, pool in enumerate(pools):
+        matrix[i, :len(pool)] = [index[item] for item in pool]
+    return matrix
+
+
+def _subject_mask(subjects):
+    mask = np.zeros(NUM_SUBJECTS, dtype=bool)
+    mask[[SUBJECT_INDEX[s] for s in subjects]] = True
+    return mask
+
+
+LIKED_POOLS = _pool_matrix([info["liked_subjects"] for info in TUSUR_FACULTIES.values()], SUBJECT_INDEX)
+DISLIKED_POOLS = _pool_matrix([info["disliked_subjects"] for info in TUSUR_FACULTIES.values()], SUBJECT_INDEX)
+DISLIKED_MASKS = np.array([_subject_mask(info["disliked_subjects"]) for info in TUSUR_FACULTIES.values()])
+ADDITIONAL_EXAMS_MASK = _subject_mask(ADDITIONAL_EXAMS)
+
+_phrase_offsets = np.cumsum([0] + [len(info["keywords"]) for info in TUSUR_FACULTIES.values()])
+KEYWORD_POOLS = _pool_matrix(
+    [range(start, end) for start, end in zip(_phrase_offsets[:-1], _phrase_offsets[1:])],
+    {i: i for i in range(len(KEYWORD_PHRASES))}
+)
+POOL_SIZES = {
+    'liked': (LIKED_POOLS >= 0).sum(axis=1),
+    'disliked': (DISLIKED_POOLS >= 0).sum(axis=1),
+    'keywords': (KEYWORD_POOLS >= 0).sum(axis=1),
+}
+
+
+def _choose_without_replacement(rng, pools, counts):
+    # Случайная перестановка каждого пула; первые counts[i] элементов строки — выборка
+    keys = rng.random(pools.shape)
+    keys[pools < 0] = np.inf
+    order = np.argsort(keys, axis=1)
+    chosen = np.take_along_axis(pools, order, axis=1)
+    selected = np.arange(pools.shape[1]) < counts[:, None]
+    return chosen, selected
+
+
+def _choose_one(rng, candidates):
+    keys = rng.random(candidates.shape)
+    keys[~candidates] = -1
+    return keys.argmax(axis=1), candidates.any(axis=1)
+
+
+def _multi_hot(chosen, selected):
+    out = np.zeros((chosen.shape[0], NUM_SUBJECTS), dtype=bool)
+    rows = np.broadcast_to(np.arange(chosen.shape[0])[:, None], chosen.shape)
+    out[rows[selected], chosen[selected]] = True
+    return out
+
+
+def _interest_texts(chosen, selected, use_variation, variation_draw):
+    texts = []
+    for row in range(chosen.shape[0]):
+        phrases = []
+        for col in np.flatnonzero(selected[row]):
+            phrase = KEYWORD_PHRASES[chosen[row, col]]
+            variations = INTEREST_VARIATIONS.get(phrase)
+            if variations and use_variation[row, col]:
+                phrase = variations[variation_draw[row, col] % len(variations)]
+            phrases.append(phrase)
+        texts.append(lemma_cache.lemmatize_text(", ".join(phrases)))
+    return texts
+
+
+def _generate_chunk(seed_sequence, size, keywords):
+    rng = np.random.default_rng(seed_sequence)
+    rows = np.arange(size)
+    num_faculties = len(FACULTY_CODES)
+
+    faculty = rng.integers(0, num_faculties, size=size)
+
+    liked_sizes = POOL_SIZES['liked'][faculty]
+    liked_counts = np.minimum(rng.integers(2, np.minimum(6, liked_sizes + 1)), liked_sizes)
+    liked = _multi_hot(*_choose_without_replacement(rng, LIKED_POOLS[faculty], liked_counts))
+
+    extra_liked, has_extra = _choose_one(rng, ~liked & ~DISLIKED_MASKS[faculty])
+    add_extra = (rng.random(size) < 0.3) & has_extra
+    liked[rows[add_extra], extra_liked[add_extra]] = True
+
+    disliked_sizes = POOL_SIZES['disliked'][faculty]
+    disliked_counts = np.minimum(rng.integers(1, np.minimum(5, disliked_sizes + 1)), disliked_sizes)
+    disliked = _multi_hot(*_choose_without_replacement(rng, DISLIKED_POOLS[faculty], disliked_counts))
+
+    exams = liked.copy()
+    extra_exam, has_exam = _choose_one(rng, ADDITIONAL_EXAMS_MASK & ~exams)
+    add_exam = (rng.random(size) < 0.4) & has_exam
+    exams[rows[add_exam], extra_exam[add_exam]] = True
+
+    keyword_sizes = POOL_SIZES['keywords'][faculty]
+    interests_counts = rng.integers(2, np.minimum(4, keyword_sizes))
+    interests_chosen, interests_selected = _choose_without_replacement(
+        rng, KEYWORD_POOLS[faculty], interests_counts
+    )
+    use_variation = rng.random(interests_chosen.shape) < 0.3
+    variation_draw = rng.integers(0, 1 << 16, size=interests_chosen.shape)
+
+    other_faculty = (faculty + rng.integers(1, num_faculties, size=size)) % num_faculties
+    not_interests_counts = np.minimum(2, POOL_SIZES['keywords'][other_faculty])
+    not_interests_chosen, not_interests_selected = _choose_without_replacement(
+        rng, KEYWORD_POOLS[other_faculty], not_interests_counts
+    )
+
+    num_keywords = len(keywords)
+    X = np.zeros((size, 3 * NUM_SUBJECTS + 2 * num_keywords), dtype=np.float32)
+    X[:, :NUM_SUBJECTS] = liked
+    X[:, NUM_SUBJECTS:2 * NUM_SUBJECTS] = disliked
+    X[:, 2 * NUM_SUBJECTS:3 * NUM_SUBJECTS] = exams
+
+    keyword_index = KeywordIndex(keywords)
+    text_start = 3 * NUM_SUBJECTS
+    keyword_index.encode_texts(
+        _interest_texts(interests_chosen, interests_selected, use_variation, variation_draw),
+        out=X[:, text_start:text_start + num_keywords], is_lemmatized=True
+    )
+    no_variation = np.zeros(not_interests_chosen.shape, dtype=bool)
+    keyword_index.encode_texts(
+        _interest_texts(not_interests_chosen, not_interests_selected, no_variation, no_variation),
+        out=X[:, text_start + num_keywords:], is_lemmatized=True
+    )
+    return X, faculty
+
+
+def generate_training_features(num_samples, keywords, seed=42, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Генерирует синтетическую обучающую выборку сразу в виде матрицы признаков.
+
+    Возвращает (X, faculty_codes). Раскладка признаков совпадает с
+    TusurFacultyPredictor.build_features. При одинаковом seed результат
+    побитово совпадает независимо от числа процессов workers.
+    """
+    sizes = [min(chunk_size, num_samples - start) for start in range(0, num_samples, chunk_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = max(1, min(workers, len(sizes)))
+
+    print(f"Генерация {num_samples} образцов для {len(FACULTY_CODES)} факультетов "
+          f"({len(sizes)} шард., процессов: {workers})...")
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            chunks = list(pool.map(_generate_chunk, seeds, sizes, repeat(list(keywords))))
+    else:
+        chunks = [_generate_chunk(s, size, keywords) for s, size in zip(seeds, sizes)]
+
+    X = np.vstack([X_chunk for X_chunk, _ in chunks])
+    faculty = np.concatenate([faculty_chunk for _, faculty_chunk in chunks])
+    print(f"Генерация завершена: {X.shape[0]} образцов, {X.shape[1]} признаков")
+    return X, np.array(FACULTY_CODES)[faculty]
@@ -0,0 +1,109 @@
+from functools import lru_cache
+
+import numpy as np
+
+
+class KeywordIndex:
+    """
+    Скомпилированный индекс ключевых слов для текстовых признаков.
+
+    Дает те же оценки, что и прежний перебор подстрок по лемматизированному
+    тексту: 1 — ключевое слово входит в текст целиком, 0.5 — входит хотя бы
+    одно слово из многословного ключевого слова, 0 — совпадений нет.
+    Текст обходится за один проход по токенам: для каждого токена один раз
+    (с кэшированием) вычисляется набор слов ключей, которые являются его
+    подстроками, а дальше работает обратный индекс слово -> id ключей.
+    """
+
+    def __init__(self, keywords, lemmatize=None, token_cache_size=50000):
+        self.keywords = list(keywords)
+        self.lemmatize = lemmatize
+        self._parts = []
+        part_ids = {}
+
+        # слово ключа -> однословные ключи / многословные ключи, где слово встречается /
+        # многословные ключи, которые с него начинаются
+        self._single = []
+        self._multi_any = []
+        self._multi_first = []
+        self._multi_words = {}
+        self._irregular = []
+
+        for kw_id, keyword in enumerate(self.keywords):
+            words = keyword.split()
+            if not words or ' '.join(words) != keyword:
+                # Нестандартные пробелы — проверяем по-старому, подстрокой
+                self._irregular.append(kw_id)
+                continue
+            ids = []
+            for word in words:
+                if word not in part_ids:
+                    part_ids[word] = len(self._parts)
+                    self._parts.append(word)
+                    self._single.append([])
+                    self._multi_any.append([])
+                    self._multi_first.append([])
+                ids.append(part_ids[word])
+            if len(words) == 1:
+                self._single[ids[0]].append(kw_id)
+            else:
+                self._multi_words[kw_id] = words
+                self._multi_first[ids[0]].append(kw_id)
+                for part_id in set(ids):
+                    self._multi_any[part_id].append(kw_id)
+
+        self._token_parts = lru_cache(maxsize=token_cache_size)(self._compute_token_parts)
+
+    def __len__(self):
+        return len(self.keywords)
+
+    def _compute_token_parts(self, token):
+        return tuple(part_id for part_id, part in enumerate(self._parts) if part in token)
+
+    def _matches_at(self, tokens, i, words):
+        last = i + len(words) - 1
+        if last >= len(tokens):
+            return False
+        if not tokens[i].endswith(words[0]) or not tokens[last].startswith(words[-1]):
+            return False
+        return all(tokens[i + k] == words[k] for k in range(1, len(words) - 1))
+
+    def encode_into(self, text, out, is_lemmatized=False):
+        out[:] = 0
+        if not text:
+            return out
+        lemmatized = text if is_lemmatized or self.lemmatize is None else self.lemmatize(text)
+        tokens = lemmatized.split()
+
+        for i, token in enumerate(tokens):
+            for part_id in self._token_parts(token):
+                for kw_id in self._single[part_id]:
+                    out[kw_id] = 1
+                for kw_id in self._multi_first[part_id]:
+                    if self._matches_at(tokens, i, self._multi_words[kw_id]):
+                        out[kw_id] = 1
+                for kw_id in self._multi_any[part_id]:
+                    if out[kw_id] == 0:
+                        out[kw_id] = 0.5
+
+        for kw_id in self._irregular:
+            keyword = self.keywords[kw_id]
+            if keyword in lemmatized:
+                out[kw_id] = 1
+            elif any(word in lemmatized for word in keyword.split()):
+                out[kw_id] = 0.5
+        return out
+
+    def encode(self, text, is_lemmatized=False):
+        return self.encode_into(text, np.zeros(len(self.keywords), dtype=np.float32), is_lemmatized)
+
+    def encode_texts(self, texts, out=None, is_lemmatized=False):
+        """Кодирует столбец текстов в матрицу (len(texts), len(keywords))."""
+        texts = list(texts)
+        if out is None:
+            out = np.zeros((len(texts), len(self.keywords)), dtype=np.float32)
+        elif out.shape != (len(texts), len(self.keywords)):
+            raise ValueError(f"Ожидалась матрица {(len(texts), len(self.keywords))}, получена {out.shape}")
+        for row, text in zip(out, texts):
+            self.encode_into(text, row, is_lemmatized)
+        return out
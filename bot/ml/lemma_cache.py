@@ -0,0 +1,89 @@
+import threading
+from collections import OrderedDict
+
+import pymorphy3 as pymorphy2
+
+from bot.config import Config
+
+
+class LemmaCache:
+    """
+    Ограниченный LRU-кэш нормальных форм слов поверх pymorphy3.
+
+    Общий для процесса: им пользуются и поток инференса, и обучение,
+    поэтому доступ защищен блокировкой.
+    """
+
+    def __init__(self, maxsize=10000):
+        self.maxsize = maxsize
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self._morph = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def morph(self):
+        if self._morph is None:
+            self._morph = pymorphy2.MorphAnalyzer()
+        return self._morph
+
+    def lemmatize_word(self, word):
+        with self._lock:
+            lemma = self._cache.get(word)
+            if lemma is not None:
+                self._cache.move_to_end(word)
+                self.hits += 1
+                return lemma
+            self.misses += 1
+
+        try:
+            lemma = self.morph.parse(word)[0].normal_form
+        except:
+            lemma = word
+
+        with self._lock:
+            self._cache[word] = lemma
+            self._cache.move_to_end(word)
+            while len(self._cache) > self.maxsize:
+                self._cache.popitem(last=False)
+                self.evictions += 1
+        return lemma
+
+    def lemmatize_text(self, text):
+        if not text:
+            return ""
+
+        lemmatized_words = []
+        for word in text.lower().split():
+            clean_word = ''.join(char for char in word if char.isalpha())
+            if clean_word:
+                lemmatized_words.append(self.lemmatize_word(clean_word))
+        return ' '.join(lemmatized_words)
+
+    def warm(self, words):
+        for word in words:
+            clean_word = ''.join(char for char in word.lower() if char.isalpha())
+            if clean_word:
+                self.lemmatize_word(clean_word)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._cache),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._cache.clear()
+            self.hits = self.misses = self.evictions = 0
+
+
+lemma_cache = LemmaCache(maxsize=Config.LEMMA_CACHE_SIZE)
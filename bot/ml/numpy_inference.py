@@ -0,0 +1,106 @@
+import numpy as np
+
+
+def _relu(x):
+    return np.maximum(x, 0, out=x)
+
+
+def _softmax(x):
+    x = x - x.max(axis=1, keepdims=True)
+    np.exp(x, out=x)
+    x /= x.sum(axis=1, keepdims=True)
+    return x
+
+
+def _linear(x):
+    return x
+
+
+ACTIVATIONS = {
+    'relu': _relu,
+    'softmax': _softmax,
+    'linear': _linear,
+}
+
+
+class NumpyDenseModel:
+    """
+    Прямой проход полносвязной сети на NumPy без TensorFlow.
+
+    Слои хранятся как список (kernel, bias, activation). Dropout на инференсе
+    является тождественным преобразованием, поэтому при экспорте пропускается.
+    """
+
+    def __init__(self, layers):
+        if not layers:
+            raise ValueError("Модель должна содержать хотя бы один слой")
+        for _, _, activation in layers:
+            if activation not in ACTIVATIONS:
+                raise ValueError(f"Неподдерживаемая активация: {activation}")
+        self.layers = [
+            (np.asarray(kernel, dtype=np.float32), np.asarray(bias, dtype=np.float32), activation)
+            for kernel, bias, activation in layers
+        ]
+
+    @property
+    def input_dim(self):
+        return self.layers[0][0].shape[0]
+
+    @property
+    def output_dim(self):
+        return self.layers[-1][0].shape[1]
+
+    def predict(self, X):
+        x = np.asarray(X, dtype=np.float32)
+        if x.ndim == 1:
+            x = x.reshape(1, -1)
+        for kernel, bias, activation in self.layers:
+            x = x @ kernel
+            x += bias
+            x = ACTIVATIONS[activation](x)
+        return x
+
+    @classmethod
+    def from_keras(cls, keras_model):
+        layers = []
+        for layer in keras_model.layers:
+            layer_type = type(layer).__name__
+            if layer_type == 'Dropout':
+                continue
+            if layer_type != 'Dense':
+                raise ValueError(f"Неподдерживаемый слой при экспорте: {layer_type}")
+            kernel, bias = layer.get_weights()
+            layers.append((kernel, bias, layer.get_config()['activation']))
+        return cls(layers)
+
+    def save(self, path):
+        arrays = {}
+        for i, (kernel, bias, _) in enumerate(self.layers):
+            arrays[f'kernel_{i}'] = kernel
+            arrays[f'bias_{i}'] = bias
+        arrays['activations'] = np.array([activation for _, _, activation in self.layers])
+        with open(path, 'wb') as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            activations = [str(a) for a in data['activations']]
+            layers = [
+                (data[f'kernel_{i}'], data[f'bias_{i}'], activation)
+                for i, activation in enumerate(activations)
+            ]
+        return cls(layers)
+
+
+def check_against_keras(keras_model, numpy_model, X=None, atol=1e-5, num_samples=256, seed=0):
+    """Сверяет выход NumPy-модели с Keras и возвращает максимальное отклонение."""
+    if X is None:
+        rng = np.random.default_rng(seed)
+        X = rng.integers(0, 3, size=(num_samples, numpy_model.input_dim)).astype(np.float32) / 2
+    expected = keras_model.predict(X, verbose=0)
+    actual = numpy_model.predict(X)
+    max_diff = float(np.max(np.abs(expected - actual)))
+    if max_diff > atol:
+        raise ValueError(f"Расхождение NumPy и Keras {max_diff:.2e} превышает допуск {atol:.0e}")
+    return max_diff
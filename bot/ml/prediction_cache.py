@@ -0,0 +1,113 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from pathlib import Path
+
+import numpy as np
+
+from bot.config import Config
+
+
+class PredictionCache:
+    """
+    LRU-кэш вероятностей модели по хэшу закодированного вектора признаков.
+
+    Кэш привязан к версии модели: при загрузке другой версии он очищается,
+    а с диска поднимаются только записи той же версии. Пояснение к
+    рекомендации зависит от исходного текста, поэтому кэшируются только
+    вероятности, а ответ собирается заново.
+    """
+
+    def __init__(self, maxsize=50000, path=None):
+        self.maxsize = maxsize
+        self.path = Path(path) if path else None
+        self.model_version = None
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    @staticmethod
+    def make_key(row):
+        row = np.ascontiguousarray(row, dtype=np.float32)
+        return hashlib.blake2b(row.tobytes(), digest_size=16).hexdigest()
+
+    def set_model_version(self, model_version):
+        with self._lock:
+            if model_version == self.model_version:
+                return
+            if self._entries:
+                self.invalidations += 1
+            self._entries.clear()
+            self.model_version = model_version
+
+    def get(self, model_version, key):
+        with self._lock:
+            probabilities = self._entries.get(key) if model_version == self.model_version else None
+            if probabilities is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return probabilities
+
+    def put(self, model_version, key, probabilities):
+        with self._lock:
+            if model_version != self.model_version:
+                return
+            self._entries[key] = np.array(probabilities, dtype=np.float32)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'invalidations': self.invalidations,
+                'model_version': self.model_version,
+            }
+
+    def save(self):
+        if self.path is None or self.model_version is None:
+            return False
+        with self._lock:
+            payload = {
+                'model_version': self.model_version,
+                'entries': {key: value.tolist() for key, value in self._entries.items()},
+            }
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_file = self.path.with_name(f".{self.path.name}.tmp-{os.getpid()}")
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(payload, f)
+        os.replace(tmp_file, self.path)
+        return True
+
+    def load(self):
+        if self.path is None or not self.path.exists():
+            return 0
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                payload = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"⚠️ Не удалось прочитать кэш рекомендаций: {e}")
+            return 0
+        if payload.get('model_version') != self.model_version:
+            return 0
+        for key, probabilities in payload.get('entries', {}).items():
+            self.put(self.model_version, key, probabilities)
+        return len(self._entries)
+
+
+prediction_cache = PredictionCache(
+    maxsize=Config.PREDICTION_CACHE_SIZE,
+    path=Config.PREDICTION_CACHE_FILE or None,
+)
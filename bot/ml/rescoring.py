@@ -0,0 +1,80 @@
+import asyncio
+import time
+from datetime import datetime
+
+from sqlalchemy import select, update
+
+from bot.utils.database import async_session, read_session
+from backend.models.questionnaire import Questionnaire
+
+
+async def rescore_questionnaires(predictor, chunk_size=500, top_k=3):
+    """
+    Пересчитывает рекомендации по всем сохраненным анкетам.
+
+    Анкеты читаются порциями по id (keyset), каждая порция предсказывается
+    одним вызовом predict_faculties вне event loop, а результаты пишутся
+    обратно одним пакетным UPDATE по первичному ключу.
+    """
+    loop = asyncio.get_running_loop()
+    started = time.perf_counter()
+    last_id = 0
+    processed = 0
+    changed = 0
+
+    while True:
+        async with read_session() as session:
+            result = await session.execute(
+                select(Questionnaire.id, Questionnaire.answers, Questionnaire.faculty_code)
+                .where(Questionnaire.id > last_id)
+                .order_by(Questionnaire.id)
+                .limit(chunk_size)
+            )
+            chunk = result.all()
+        if not chunk:
+            break
+
+        predictions = await loop.run_in_executor(
+            None, predictor.predict_faculties, [row.answers for row in chunk], top_k
+        )
+
+        rescored_at = datetime.utcnow()
+        updates = []
+        for row, top in zip(chunk, predictions):
+            best = top[0]
+            if best['code'] != row.faculty_code:
+                changed += 1
+            updates.append({
+                'id': row.id,
+                'rescored_faculty_code': best['code'],
+                'rescored_confidence': best['probability'],
+                'rescored_top': [{'code': item['code'], 'probability': item['probability']} for item in top],
+                'rescored_model_version': predictor.model_version,
+                'rescored_at': rescored_at,
+            })
+
+        async with async_session() as session:
+            await session.execute(update(Questionnaire), updates)
+            await session.commit()
+
+        processed += len(chunk)
+        last_id = chunk[-1].id
+
+    print(
+        f"🔁 Пересчитано анкет: {processed}, рекомендация изменилась у {changed} "
+        f"(модель {predictor.model_version}, {time.perf_counter() - started:.1f} с)"
+    )
+    return {'processed': processed, 'changed': changed}
+
+
+async def main():
+    from bot.ml.tusur_model import TusurFacultyPredictor
+
+    predictor = TusurFacultyPredictor()
+    if not predictor.load_model():
+        return
+    await rescore_questionnaires(predictor)
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
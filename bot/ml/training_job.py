@@ -0,0 +1,107 @@
+import asyncio
+import multiprocessing
+import queue
+import time
+from pathlib import Path
+
+
+def _run_training(model_dir, num_samples, seed, epochs, progress_queue):
+    from bot.ml.tusur_model import TusurFacultyPredictor
+
+    try:
+        predictor = TusurFacultyPredictor(model_path=model_dir)
+        predictor.train_model(
+            num_samples=num_samples, seed=seed, epochs=epochs,
+            progress_callback=progress_queue.put
+        )
+        progress_queue.put({'stage': 'saving'})
+        # save_artifact собирает новую версию отдельно и атомарно переключает CURRENT
+        predictor.save_model()
+        progress_queue.put({'stage': 'done', 'model_version': predictor.model_version})
+    except Exception as e:
+        progress_queue.put({'stage': 'failed', 'error': str(e)})
+    finally:
+        progress_queue.put(None)
+
+
+class TrainingJob:
+    """
+    Обучение модели в отдельном процессе.
+
+    Новая версия артефакта публикуется в model_dir только после успешного
+    обучения. Ход обучения доступен через status().
+    """
+
+    def __init__(self, model_dir="bot/ml/trained_model", num_samples=1500, seed=42, epochs=100):
+        self.model_dir = Path(model_dir)
+        self.num_samples = num_samples
+        self.seed = seed
+        self.epochs = epochs
+        self.progress = {'stage': 'idle'}
+        self.started_at = None
+        self.finished_at = None
+        self._process = None
+
+    @property
+    def running(self):
+        return self._process is not None and self._process.is_alive()
+
+    def status(self):
+        status = dict(self.progress)
+        if self.started_at is not None:
+            finished = self.finished_at or time.monotonic()
+            status['duration'] = round(finished - self.started_at, 1)
+        if status.get('stage') == 'training' and status.get('epochs'):
+            status['percent'] = round(100 * status['epoch'] / status['epochs'])
+        return status
+
+    def _handle_progress(self, message):
+        self.progress = message
+        if message['stage'] == 'training':
+            epoch = message['epoch']
+            if epoch == message['epochs'] or epoch % 10 == 0:
+                print(f"🧠 Обучение: эпоха {epoch}/{message['epochs']}")
+        else:
+            print(f"🧠 Обучение: {message['stage']}")
+
+    def _wait(self, progress_queue):
+        while True:
+            try:
+                message = progress_queue.get(timeout=1)
+            except queue.Empty:
+                if not self._process.is_alive():
+                    break
+                continue
+            if message is None:
+                break
+            self._handle_progress(message)
+        self._process.join()
+
+    async def run(self):
+        """Запускает обучение и ждет его завершения. Возвращает True при успехе."""
+        if self.running:
+            raise RuntimeError("Обучение уже выполняется")
+
+        context = multiprocessing.get_context("spawn")
+        progress_queue = context.Queue()
+        self._process = context.Process(
+            target=_run_training,
+            args=(str(self.model_dir), self.num_samples, self.seed, self.epochs, progress_queue),
+            name="tusur-training",
+        )
+        self.started_at = time.monotonic()
+        self.finished_at = None
+        self.progress = {'stage': 'starting'}
+        self._process.start()
+
+        await asyncio.get_running_loop().run_in_executor(None, self._wait, progress_queue)
+        self.finished_at = time.monotonic()
+
+        if self.progress.get('stage') != 'done':
+            if self.progress.get('stage') != 'failed':
+                self.progress = {'stage': 'failed', 'error': f"exit code {self._process.exitcode}"}
+            print(f"❌ Обучение завершилось с ошибкой: {self.progress.get('error')}")
+            return False
+
+        print(f"✅ Обучение завершено за {self.finished_at - self.started_at:.1f} с")
+        return True
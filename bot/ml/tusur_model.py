@@ -1,17 +1,12 @@
 import numpy as np
-import pandas as pd
-from sklearn.preprocessing import MultiLabelBinarizer, LabelEncoder
-from sklearn.model_selection import train_test_split
-from tensorflow.keras.models import Sequential
-from tensorflow.keras.layers import Dense, Dropout
-from tensorflow.keras.optimizers import Adam
-import pymorphy3 as pymorphy2
-import os
-import pickle
-import json
 from pathlib import Path
 
-morph = pymorphy2.MorphAnalyzer()
+from bot.ml.numpy_inference import NumpyDenseModel, check_against_keras
+from bot.ml.artifact import save_artifact, load_artifact, current_version, has_legacy_model
+from bot.ml.lemma_cache import lemma_cache
+from bot.ml.keyword_index import KeywordIndex
+from bot.ml.prediction_cache import prediction_cache
+from bot.data import subject_masks
 
 TUSUR_FACULTIES = {
     "РТФ": {
@@ -56,169 +51,78 @@ SCHOOL_SUBJECTS_LIST = [
 ]
 
 class TusurFacultyPredictor:
-    def __init__(self):
-        self.mlb = MultiLabelBinarizer(classes=SCHOOL_SUBJECTS_LIST)
-        self.label_encoder = LabelEncoder()
+    def __init__(self, model_path="bot/ml/trained_model"):
+        self._set_subjects(SCHOOL_SUBJECTS_LIST)
+        self.classes = []
         self.model = None
+        self.keras_model = None
+        self.model_version = None
+        self.metrics = {}
         self.all_keywords = []
+        self._keyword_index = None
         self.is_trained = False
-        self.model_path = Path("bot/ml/trained_model")
+        self.model_path = Path(model_path)
         self.model_path.mkdir(parents=True, exist_ok=True)
         
     def lemmatize_text(self, text):
-        if not text:
-            return ""
-        
-        words = text.lower().split()
-        lemmatized_words = []
-        
-        for word in words:
-            clean_word = ''.join(char for char in word if char.isalpha())
-            if clean_word:
-                try:
-                    parsed = morph.parse(clean_word)[0]
-                    lemmatized_words.append(parsed.normal_form)
-                except:
-                    lemmatized_words.append(clean_word)
-        
-        return ' '.join(lemmatized_words)
-    
-    def generate_training_data(self, num_samples=2000):
-        data = []
-        faculty_codes = list(TUSUR_FACULTIES.keys())
+        return lemma_cache.lemmatize_text(text)
 
-        self.all_keywords = []
+    def warm_lemma_cache(self):
         for faculty_info in TUSUR_FACULTIES.values():
-            self.all_keywords.extend(faculty_info["keywords"])
-        self.all_keywords = list(set(self.all_keywords))
-        
-        print(f"Генерация {num_samples} образцов для {len(faculty_codes)} факультетов...")
-        
-        for i in range(num_samples):
-            if i % 400 == 0:
-                print(f"Сгенерировано {i}/{num_samples} образцов")
-                
-            faculty_code = np.random.choice(faculty_codes)
-            faculty = TUSUR_FACULTIES[faculty_code]
-
-            liked_available = faculty["liked_subjects"].copy()
-            liked_count = np.random.randint(2, min(6, len(liked_available) + 1))
-            liked = np.random.choice(liked_available, size=min(liked_count, len(liked_available)), replace=False).tolist()
-
-            if np.random.random() < 0.3:
-                other_subjects = [s for s in SCHOOL_SUBJECTS_LIST if s not in liked and s not in faculty["disliked_subjects"]]
-                if other_subjects:
-                    liked.append(np.random.choice(other_subjects))
-
-            disliked_available = faculty["disliked_subjects"].copy()
-            disliked_count = np.random.randint(1, min(5, len(disliked_available) + 1))
-            disliked = np.random.choice(disliked_available, size=min(disliked_count, len(disliked_available)), replace=False).tolist()
-
-            exams = liked.copy()
-            if np.random.random() < 0.4:
-                additional_exams = ["русский_язык", "математика", "физика", "информатика", "обществознание"]
-                additional = [e for e in additional_exams if e not in exams]
-                if additional:
-                    exams.append(np.random.choice(additional))
-
-            interests_count = np.random.randint(2, min(4, len(faculty["keywords"])))
-            interests_keywords = np.random.choice(faculty["keywords"], size=interests_count, replace=False)
-            interests = ", ".join(interests_keywords)
-
-            interest_variations = {
-                "программирование": ["программирование", "кодинг", "разработка программ", "написание кода"],
-                "электроника": ["электроника", "электронные устройства", "микроэлектроника"],
-                "управление": ["управление", "менеджмент", "руководство", "администрирование"],
-                "психология": ["психология", "изучение поведения", "работа с людьми"],
-                "радиотехника": ["радиотехника", "радиосвязь", "беспроводные технологии"]
-            }
-            
-            for keyword in interests_keywords:
-                if keyword in interest_variations and np.random.random() < 0.3:
-                    interests = interests.replace(keyword, np.random.choice(interest_variations[keyword]))
-
-            other_faculties = [f for f in faculty_codes if f != faculty_code]
-            other_faculty = np.random.choice(other_faculties)
-            not_interests_keywords = np.random.choice(TUSUR_FACULTIES[other_faculty]["keywords"], 
-                                                     size=min(2, len(TUSUR_FACULTIES[other_faculty]["keywords"])), 
-                                                     replace=False)
-            not_interests = ", ".join(not_interests_keywords)
-            
-            data.append({
-                "liked_subjects": liked,
-                "disliked_subjects": disliked,
-                "exams": exams,
-                "interests": self.lemmatize_text(interests),
-                "not_interests": self.lemmatize_text(not_interests),
-                "faculty": faculty_code
-            })
-        
-        print(f"Генерация завершена: {len(data)} образцов")
-        return pd.DataFrame(data)
+            for keyword in faculty_info["keywords"]:
+                lemma_cache.warm(keyword.split())
     
-    def encode_text_features(self, text, keywords):
-        if not text:
-            return [0] * len(keywords)
-        
-        lemmatized = self.lemmatize_text(text)
-        encoded = []
-        
-        for keyword in keywords:
-            score = 0
-            if keyword in lemmatized:
-                score = 1
-            elif any(word in lemmatized for word in keyword.split()):
-                score = 0.5
-            encoded.append(score)
-        
-        return encoded
+    def collect_keywords(self):
+        keywords = []
+        for faculty_info in TUSUR_FACULTIES.values():
+            keywords.extend(faculty_info["keywords"])
+        # Порядок фиксирован, чтобы раскладка признаков была воспроизводимой
+        return list(dict.fromkeys(keywords))
+
+    def get_keyword_index(self, keywords=None):
+        keywords = self.all_keywords if keywords is None else keywords
+        if self._keyword_index is None or self._keyword_index.keywords != list(keywords):
+            self._keyword_index = KeywordIndex(keywords, lemmatize=self.lemmatize_text)
+        return self._keyword_index
+
+    def encode_text_features(self, text, keywords, is_lemmatized=False):
+        return self.get_keyword_index(keywords).encode(text, is_lemmatized)
     
-    def prepare_features(self, df):
-        print("Подготовка признаков...")
+    def train_model(self, num_samples=2000, seed=42, workers=None, epochs=100, progress_callback=None):
+        from sklearn.preprocessing import LabelEncoder
+        from sklearn.model_selection import train_test_split
+        from bot.ml.data_generator import generate_training_features
 
-        liked_encoded = self.mlb.fit_transform(df['liked_subjects'])
-        disliked_encoded = self.mlb.transform(df['disliked_subjects'])
-        exams_encoded = self.mlb.transform(df['exams'])
-        
-        print(f"Размеры кодированных предметов: {liked_encoded.shape}")
+        def report(stage, **info):
+            if progress_callback is not None:
+                progress_callback({'stage': stage, **info})
 
-        interests_encoded = np.array([
-            self.encode_text_features(text, self.all_keywords) 
-            for text in df['interests']
-        ])
-        not_interests_encoded = np.array([
-            self.encode_text_features(text, self.all_keywords) 
-            for text in df['not_interests']
-        ])
-        
-        print(f"Размеры текстовых признаков: {interests_encoded.shape}")
-
-        X = np.hstack([
-            liked_encoded,      # 28 признаков
-            disliked_encoded,   # 28 признаков  
-            exams_encoded,      # 28 признаков
-            interests_encoded,  # количество ключевых слов
-            not_interests_encoded  # количество ключевых слов
-        ])
-        
-        print(f"Итоговая размерность признаков: {X.shape}")
-        return X
-    
-    def train_model(self, num_samples=2000):
         print("🧠 Начинаем обучение ML модели для ТУСУР...")
+        report('generating', num_samples=num_samples)
 
-        df = self.generate_training_data(num_samples)
-
-        X = self.prepare_features(df)
+        self.all_keywords = self.collect_keywords()
+        self.warm_lemma_cache()
+        X, faculty_codes = generate_training_features(num_samples, self.all_keywords, seed=seed, workers=workers)
+        print(f"Кэш лемм: {lemma_cache.stats()}")
 
-        y = self.label_encoder.fit_transform(df['faculty'])
-        print(f"Факультеты: {list(self.label_encoder.classes_)}")
+        self._set_subjects(SCHOOL_SUBJECTS_LIST)
+        label_encoder = LabelEncoder()
+        y = label_encoder.fit_transform(faculty_codes)
+        self.classes = [str(code) for code in label_encoder.classes_]
+        print(f"Факультеты: {self.classes}")
 
-        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
+        X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=seed, stratify=y)
         print(f"Обучающая выборка: {X_train.shape}, Тестовая выборка: {X_test.shape}")
 
+        from tensorflow.keras.models import Sequential
+        from tensorflow.keras.layers import Dense, Dropout
+        from tensorflow.keras.optimizers import Adam
+        from tensorflow.keras.utils import set_random_seed
+        from tensorflow.keras.callbacks import LambdaCallback
+
+        set_random_seed(seed)
         print("Создание нейронной сети...")
-        self.model = Sequential([
+        self.keras_model = Sequential([
             Dense(128, activation='relu', input_shape=(X.shape[1],)),
             Dropout(0.3),
             Dense(64, activation='relu'),
@@ -228,59 +132,166 @@ class TusurFacultyPredictor:
             Dense(len(TUSUR_FACULTIES), activation='softmax')
         ])
 
-        self.model.compile(
+        self.keras_model.compile(
             optimizer=Adam(learning_rate=0.001),
             loss='sparse_categorical_crossentropy',
             metrics=['accuracy']
         )
         
         print("Архитектура модели:")
-        self.model.summary()
+        self.keras_model.summary()
 
         print("Запуск обучения...")
-        history = self.model.fit(
+        report('training', epoch=0, epochs=epochs)
+        epoch_callback = LambdaCallback(on_epoch_end=lambda epoch, logs: report(
+            'training', epoch=epoch + 1, epochs=epochs,
+            accuracy=float(logs.get('accuracy', 0)), val_accuracy=float(logs.get('val_accuracy', 0))
+        ))
+        history = self.keras_model.fit(
             X_train, y_train,
             validation_data=(X_test, y_test),
-            epochs=100,
+            epochs=epochs,
             batch_size=32,
-            verbose=1
+            verbose=1 if progress_callback is None else 2,
+            callbacks=[epoch_callback]
         )
 
-        test_loss, test_accuracy = self.model.evaluate(X_test, y_test, verbose=0)
+        test_loss, test_accuracy = self.keras_model.evaluate(X_test, y_test, verbose=0)
         print(f"\n✅ Обучение завершено!")
         print(f"Точность на тестовой выборке: {test_accuracy:.3f}")
+
+        self.model = NumpyDenseModel.from_keras(self.keras_model)
+        max_diff = check_against_keras(self.keras_model, self.model, X_test)
+        print(f"NumPy-инференс сверен с Keras (макс. отклонение {max_diff:.2e})")
+        report('trained', test_accuracy=float(test_accuracy))
+        self.metrics = {'test_accuracy': float(test_accuracy), 'num_samples': num_samples, 'seed': seed}
         
         self.is_trained = True
         return history
     
+    def _set_subjects(self, subjects):
+        self.subjects = list(subjects)
+        self._subject_index = {subject: i for i, subject in enumerate(self.subjects)}
+        # Маски выбора из FSM кладутся в признаки напрямую, если порядок предметов совпадает
+        self._mask_aligned = tuple(self.subjects) == subject_masks.SUBJECT_CODES['school']
+        self._bit_shifts = np.arange(len(self.subjects), dtype=np.int64)
+
+    def encode_subjects(self, subjects, out):
+        if isinstance(subjects, int):
+            if self._mask_aligned:
+                out[:] = (subjects >> self._bit_shifts) & 1
+                return out
+            subjects = subject_masks.to_codes('school', subjects)
+        # Неизвестные предметы игнорируются, как раньше в MultiLabelBinarizer
+        for subject in subjects:
+            index = self._subject_index.get(subject)
+            if index is not None:
+                out[index] = 1
+        return out
+
+    @property
+    def num_features(self):
+        return 3 * len(self.subjects) + 2 * len(self.all_keywords)
+
+    def build_features(self, user_data, row=None):
+        num_subjects = len(self.subjects)
+        num_keywords = len(self.all_keywords)
+        text_start = 3 * num_subjects
+        if row is None:
+            row = np.zeros(self.num_features, dtype=np.float32)
+        else:
+            row[:] = 0
+
+        self.encode_subjects(user_data.get('liked_subjects', []), row[:num_subjects])
+        self.encode_subjects(user_data.get('disliked_subjects', []), row[num_subjects:2 * num_subjects])
+        self.encode_subjects(user_data.get('exams', []), row[2 * num_subjects:text_start])
+
+        keyword_index = self.get_keyword_index()
+        keyword_index.encode_into(user_data.get('interests', ''), row[text_start:text_start + num_keywords])
+        keyword_index.encode_into(user_data.get('not_interests', ''), row[text_start + num_keywords:])
+        return row
+
+    def build_feature_matrix(self, users_data):
+        X = np.zeros((len(users_data), self.num_features), dtype=np.float32)
+        for row, user_data in zip(X, users_data):
+            self.build_features(user_data, row)
+        return X
+
     def predict_faculty(self, user_data):
+        return self.predict_batch([user_data])[0]
+
+    def predict_faculties(self, users_data, top_k=3):
+        """
+        Пакетное предсказание: одна матрица признаков и один прямой проход.
+
+        Для каждого входа возвращает top_k факультетов по убыванию вероятности.
+        """
         if not self.is_trained:
-            print("⚠️ Модель не обучена! Запускаем обучение...")
-            self.train_model()
-        
+            raise RuntimeError("Модель не обучена")
+        if not users_data:
+            return []
+
+        probabilities = self.model.predict(self.build_feature_matrix(users_data))
+        top_k = min(top_k, probabilities.shape[1])
+        top_indices = np.argsort(-probabilities, axis=1)[:, :top_k]
+        return [
+            [
+                {
+                    'code': self.classes[index],
+                    'name': TUSUR_FACULTIES[self.classes[index]]['name'],
+                    'probability': float(row_probabilities[index]),
+                }
+                for index in row_indices
+            ]
+            for row_probabilities, row_indices in zip(probabilities, top_indices)
+        ]
+
+    def predict_batch(self, users_data):
+        if not self.is_trained:
+            # Обучение на пути запроса недопустимо — его выполняет TrainingJob
+            raise RuntimeError("Модель не обучена")
+
+        results = [None] * len(users_data)
+        rows = []
+        row_indices = []
+        row_keys = []
+        for i, user_data in enumerate(users_data):
+            try:
+                row = self.build_features(user_data)
+            except Exception as e:
+                print(f"Ошибка предсказания: {e}")
+                results[i] = self._fallback_prediction()
+                continue
+
+            key = prediction_cache.make_key(row)
+            probabilities = prediction_cache.get(self.model_version, key)
+            if probabilities is not None:
+                results[i] = self._format_prediction(user_data, probabilities)
+            else:
+                rows.append(row)
+                row_indices.append(i)
+                row_keys.append(key)
+
+        if rows:
+            try:
+                probabilities = self.model.predict(np.vstack(rows))
+            except Exception as e:
+                print(f"Ошибка предсказания: {e}")
+                probabilities = None
+
+            for row, i in enumerate(row_indices):
+                if probabilities is None:
+                    results[i] = self._fallback_prediction()
+                else:
+                    prediction_cache.put(self.model_version, row_keys[row], probabilities[row])
+                    results[i] = self._format_prediction(users_data[i], probabilities[row])
+
+        return results
+
+    def _format_prediction(self, user_data, probabilities):
         try:
-            liked_enc = self.mlb.transform([user_data.get('liked_subjects', [])])
-            disliked_enc = self.mlb.transform([user_data.get('disliked_subjects', [])])
-            exams_enc = self.mlb.transform([user_data.get('exams', [])])
-            
-            interests_enc = np.array([
-                self.encode_text_features(user_data.get('interests', ''), self.all_keywords)
-            ])
-            not_interests_enc = np.array([
-                self.encode_text_features(user_data.get('not_interests', ''), self.all_keywords)
-            ])
-
-            X_input = np.hstack([
-                liked_enc,
-                disliked_enc,
-                exams_enc,
-                interests_enc,
-                not_interests_enc
-            ])
-
-            probabilities = self.model.predict(X_input, verbose=0)[0]
             faculty_index = np.argmax(probabilities)
-            faculty_code = self.label_encoder.inverse_transform([faculty_index])[0]
+            faculty_code = self.classes[faculty_index]
             confidence = probabilities[faculty_index]
             
             faculty_info = TUSUR_FACULTIES[faculty_code]
@@ -292,22 +303,28 @@ class TusurFacultyPredictor:
                 'name': faculty_info['name'],
                 'reason': explanation,
                 'directions': "• " + "\n• ".join(faculty_info['keywords'][:4]),
-                'confidence': float(confidence)
+                'confidence': float(confidence),
+                'model_version': self.model_version
             }
             
         except Exception as e:
             print(f"Ошибка предсказания: {e}")
-            return {
-                'code': 'ФИТ',
-                'name': TUSUR_FACULTIES['ФИТ']['name'],
-                'reason': 'Универсальный выбор для современных технологий (fallback)',
-                'directions': '• Программирование\n• Инновации\n• IT-технологии',
-                'confidence': 0.5
-            }
+            return self._fallback_prediction()
+
+    def _fallback_prediction(self):
+        return {
+            'code': 'ФИТ',
+            'name': TUSUR_FACULTIES['ФИТ']['name'],
+            'reason': 'Универсальный выбор для современных технологий (fallback)',
+            'directions': '• Программирование\n• Инновации\n• IT-технологии',
+            'confidence': 0.5
+        }
     
     def _generate_explanation(self, user_data, faculty_code, confidence):
         faculty = TUSUR_FACULTIES[faculty_code]
         liked_subjects = user_data.get('liked_subjects', [])
+        if isinstance(liked_subjects, int):
+            liked_subjects = subject_masks.to_codes('school', liked_subjects)
         interests = user_data.get('interests', '')
         
         explanations = []
@@ -331,50 +348,71 @@ class TusurFacultyPredictor:
     
     def save_model(self):
         if self.model and self.is_trained:
-            model_file = self.model_path / "tusur_model.keras"
-            data_file = self.model_path / "model_data.pkl"
-
-            self.model.save(model_file)
-
-            with open(data_file, 'wb') as f:
-                pickle.dump({
-                    'mlb': self.mlb,
-                    'label_encoder': self.label_encoder, 
-                    'all_keywords': self.all_keywords,
-                    'is_trained': self.is_trained
-                }, f)
-            
-            print(f"✅ Модель сохранена в {model_file}")
+            manifest = save_artifact(
+                self.model_path, self.model, self.subjects, self.all_keywords, self.classes, self.metrics
+            )
+            self.model_version = manifest['model_version']
+            print(f"✅ Модель сохранена в {self.model_path / self.model_version}")
             return True
         return False
     
     def load_model(self):
-        model_file = self.model_path / "tusur_model.keras"
-        data_file = self.model_path / "model_data.pkl"
-        
         try:
-            if model_file.exists() and data_file.exists():
-                from tensorflow.keras.models import load_model
-
-                self.model = load_model(model_file)
-
-                with open(data_file, 'rb') as f:
-                    data = pickle.load(f)
-                    self.mlb = data['mlb']
-                    self.label_encoder = data['label_encoder']
-                    self.all_keywords = data['all_keywords']
-                    self.is_trained = data.get('is_trained', True)
-                
-                print(f"✅ Модель загружена из {model_file}")
-                return True
-            else:
+            if current_version(self.model_path) is None and not self._migrate_legacy_model():
                 print("⚠️ Сохраненная модель не найдена, будет создана новая")
                 return False
+
+            self.model, manifest = load_artifact(self.model_path)
+            self._set_subjects(manifest['subjects'])
+            self.all_keywords = manifest['keywords']
+            self.classes = manifest['classes']
+            self.metrics = manifest.get('metrics', {})
+            self.model_version = manifest['model_version']
+            self.is_trained = True
+
+            self.warm_lemma_cache()
+            print(f"✅ Модель {self.model_version} загружена из {self.model_path}")
+            return True
                 
         except Exception as e:
             print(f"❌ Ошибка загрузки модели: {e}")
             return False
 
+    def _migrate_legacy_model(self):
+        # Однократный перевод старого формата (веса .npz или .keras + pickle sklearn) в артефакт
+        weights_file = self.model_path / "model_weights.npz"
+        model_file = self.model_path / "tusur_model.keras"
+        data_file = self.model_path / "model_data.pkl"
+        if not has_legacy_model(self.model_path):
+            return False
+
+        import pickle
+        with open(data_file, 'rb') as f:
+            data = pickle.load(f)
+        if weights_file.exists():
+            numpy_model = NumpyDenseModel.load(weights_file)
+        else:
+            numpy_model = self.export_keras_weights(model_file)
+        save_artifact(
+            self.model_path,
+            numpy_model,
+            [str(subject) for subject in data['mlb'].classes_],
+            data['all_keywords'],
+            [str(code) for code in data['label_encoder'].classes_],
+        )
+        print("✅ Модель старого формата конвертирована в артефакт")
+        return True
+
+    def export_keras_weights(self, model_file):
+        # Конвертация старого .keras в веса NumPy; TensorFlow нужен только здесь
+        from tensorflow.keras.models import load_model
+
+        keras_model = load_model(model_file)
+        numpy_model = NumpyDenseModel.from_keras(keras_model)
+        max_diff = check_against_keras(keras_model, numpy_model)
+        print(f"✅ Веса {model_file} экспортированы (макс. отклонение {max_diff:.2e})")
+        return numpy_model
+
 faculty_predictor = TusurFacultyPredictor()
 
 def initialize_model():
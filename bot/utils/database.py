@@ -1,70 +1,274 @@
+from sqlalchemy import event, bindparam, or_, func, update
+from sqlalchemy.engine import make_url
+from datetime import datetime
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import sessionmaker, joinedload
 from sqlalchemy.future import select
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 
 from bot.config import Config
-from backend.models.base import Base
 from backend.models.user import User
 from backend.models.application import Application
+from backend.models.questionnaire import Questionnaire
+from backend.models.application_stat import ApplicationStat
+from bot.utils.user_cache import user_cache, UserSnapshot
 
-engine = create_async_engine(Config.DATABASE_URL, echo=False, future=True)
+
+def _is_sqlite_file(url):
+    return url.get_backend_name() == 'sqlite' and url.database not in (None, '', ':memory:')
+
+
+def _sqlite_pragmas(read_only):
+    pragmas = [
+        f"PRAGMA busy_timeout={Config.SQLITE_BUSY_TIMEOUT_MS}",
+        f"PRAGMA synchronous={Config.SQLITE_SYNCHRONOUS}",
+        f"PRAGMA mmap_size={Config.SQLITE_MMAP_SIZE}",
+        f"PRAGMA cache_size={Config.SQLITE_CACHE_SIZE}",
+        "PRAGMA foreign_keys=ON",
+    ]
+    if read_only:
+        pragmas.append("PRAGMA query_only=ON")
+    else:
+        # journal_mode хранится в самом файле БД, его выставляет пишущее соединение
+        pragmas.insert(0, f"PRAGMA journal_mode={Config.SQLITE_JOURNAL_MODE}")
+    return pragmas
+
+
+def _create_engine(url, pool_size, max_overflow, read_only=False):
+    url = make_url(url)
+    options = {
+        'echo': False,
+        'future': True,
+        'query_cache_size': Config.DB_QUERY_CACHE_SIZE,
+    }
+    if url.get_backend_name() != 'sqlite' or _is_sqlite_file(url):
+        # Для файловой SQLite aiosqlite по умолчанию берет NullPool и открывает
+        # новое соединение на каждую сессию
+        options.update(
+            poolclass=AsyncAdaptedQueuePool,
+            pool_size=pool_size,
+            max_overflow=max_overflow,
+            pool_timeout=Config.DB_POOL_TIMEOUT,
+        )
+    new_engine = create_async_engine(url, **options)
+
+    if url.get_backend_name() == 'sqlite':
+        pragmas = _sqlite_pragmas(read_only)
+
+        @event.listens_for(new_engine.sync_engine, "connect")
+        def set_sqlite_pragmas(dbapi_connection, connection_record):
+            cursor = dbapi_connection.cursor()
+            for pragma in pragmas:
+                cursor.execute(pragma)
+            cursor.close()
+
+    return new_engine
+
+
+def _read_url():
+    if Config.DATABASE_READ_URL:
+        return Config.DATABASE_READ_URL
+    url = make_url(Config.DATABASE_URL)
+    if _is_sqlite_file(url) and not url.database.startswith('file:'):
+        return url.set(database=f"file:{url.database}", query={**url.query, 'mode': 'ro', 'uri': 'true'})
+    return url
+
+
+engine = _create_engine(Config.DATABASE_URL, Config.DB_POOL_SIZE, Config.DB_MAX_OVERFLOW)
 async_session = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
 
+# Отдельный пул только для чтения: в режиме WAL читатели не ждут писателя
+if Config.DATABASE_READ_URL or _is_sqlite_file(make_url(Config.DATABASE_URL)):
+    read_engine = _create_engine(_read_url(), Config.DB_READ_POOL_SIZE, 0, read_only=True)
+else:
+    # БД в памяти существует только внутри своего соединения
+    read_engine = engine
+read_session = sessionmaker(read_engine, class_=AsyncSession, expire_on_commit=False)
+
+# Запросы горячего пути собраны один раз; их скомпилированный SQL берется
+# из кэша движка (query_cache_size)
+USER_BY_TELEGRAM_ID = select(User).where(User.telegram_id == bindparam('telegram_id'))
+USER_WITH_APPLICATIONS = (
+    select(User)
+    .options(joinedload(User.applications))
+    .where(User.telegram_id == bindparam('telegram_id'))
+)
+
+def dialect_insert(model):
+    """INSERT с поддержкой ON CONFLICT для текущей СУБД (SQLite или PostgreSQL)."""
+    if engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert(model)
+
+
 async def get_db():
     async with async_session() as session:
         yield session
 
+async def get_read_db():
+    async with read_session() as session:
+        yield session
+
 async def get_user_by_telegram_id(telegram_id):
-    async with async_session() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
-        return result.scalar_one_or_none()
+    """Возвращает UserSnapshot (через кэш) или None."""
+    from bot.utils.user_writes import user_write_buffer
+    await user_write_buffer.flush_if_pending(telegram_id)
 
-async def create_or_update_user(telegram_id, username, first_name, last_name, phone=None, email=None):
-    async with async_session() as session:
-        result = await session.execute(
-            select(User).where(User.telegram_id == telegram_id)
-        )
+    snapshot = user_cache.get(telegram_id)
+    if snapshot is not None:
+        return snapshot
+
+    token = user_cache.begin_load()
+    async with read_session() as session:
+        result = await session.execute(USER_BY_TELEGRAM_ID, {'telegram_id': telegram_id})
         user = result.scalar_one_or_none()
-        if user:
-            if phone is not None:
-                user.phone = phone
-            if email is not None:
-                user.email = email
-            await session.commit()
-            return user
-        user = User(
-            telegram_id=telegram_id,
-            username=username,
-            first_name=first_name,
-            last_name=last_name,
-            phone=phone,
-            email=email,
-            role='user'
-        )
-        session.add(user)
+    if user is None:
+        return None
+    snapshot = UserSnapshot.from_orm(user)
+    user_cache.put(telegram_id, snapshot, token)
+    return snapshot
+
+async def get_user_with_applications(telegram_id):
+    """
+    Пользователь и его заявки одним запросом (LEFT JOIN).
+    Возвращает (UserSnapshot, список заявок) или (None, []).
+    """
+    from bot.utils.user_writes import user_write_buffer
+    await user_write_buffer.flush_if_pending(telegram_id)
+
+    token = user_cache.begin_load()
+    async with read_session() as session:
+        result = await session.execute(USER_WITH_APPLICATIONS, {'telegram_id': telegram_id})
+        user = result.unique().scalar_one_or_none()
+    if user is None:
+        return None, []
+    snapshot = UserSnapshot.from_orm(user)
+    user_cache.put(telegram_id, snapshot, token)
+    return snapshot, list(user.applications)
+
+async def upsert_users(rows):
+    """Многострочный upsert профилей по telegram_id; неизменные строки не переписываются."""
+    stmt = dialect_insert(User).values(rows)
+    excluded = stmt.excluded
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={
+            'username': excluded.username,
+            'first_name': excluded.first_name,
+            'last_name': excluded.last_name,
+        },
+        where=or_(
+            User.username.is_distinct_from(excluded.username),
+            User.first_name.is_distinct_from(excluded.first_name),
+            User.last_name.is_distinct_from(excluded.last_name),
+        ),
+    )
+    async with async_session() as session:
+        await session.execute(stmt)
         await session.commit()
-        return user
+    user_cache.invalidate(*(row['telegram_id'] for row in rows))
 
-async def add_application(user_id: int, faculty_code: str):
+async def _bump_application_stats(session, faculty_code, status, created_at, delta):
+    # Вызывается внутри транзакции, изменяющей заявку: счетчик и заявка фиксируются вместе
+    stmt = dialect_insert(ApplicationStat).values(
+        faculty_code=faculty_code,
+        status=status,
+        day=(created_at or datetime.utcnow()).date(),
+        count=delta
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[ApplicationStat.faculty_code, ApplicationStat.status, ApplicationStat.day],
+        set_={'count': ApplicationStat.count + stmt.excluded.count},
+    )
+    await session.execute(stmt)
+
+async def _insert_application(session, user_id, faculty_code):
+    result = await session.execute(
+        dialect_insert(Application)
+        .values(user_id=user_id, faculty_code=faculty_code)
+        .on_conflict_do_nothing(index_elements=[Application.user_id, Application.faculty_code])
+        .returning(Application.id, Application.status, Application.created_at)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return None
+    await _bump_application_stats(session, faculty_code, row.status, row.created_at, 1)
+    return row.id
+
+async def update_application_status(application_id: int, status: str):
+    """
+    Меняет статус заявки вместе со счетчиками.
+    Возвращает True, если статус изменен, False — если нет, None — если заявки нет.
+    """
     async with async_session() as session:
-        exists = await session.execute(
-            select(Application).where(
-                Application.user_id == user_id,
-                Application.faculty_code == faculty_code
+        async with session.begin():
+            row = (await session.execute(
+                select(Application.faculty_code, Application.status, Application.created_at)
+                .where(Application.id == application_id)
+            )).one_or_none()
+            if row is None:
+                return None
+            if row.status == status:
+                return False
+            # Условие на прежний статус защищает счетчики от параллельной смены статуса
+            result = await session.execute(
+                update(Application)
+                .where(Application.id == application_id, Application.status == row.status)
+                .values(status=status)
             )
-        )
-        if exists.scalar_one_or_none():
-            return
-        app = Application(user_id=user_id, faculty_code=faculty_code)
-        session.add(app)
-        await session.commit()
-        return app
+            if result.rowcount == 0:
+                return False
+            await _bump_application_stats(session, row.faculty_code, row.status, row.created_at, -1)
+            await _bump_application_stats(session, row.faculty_code, status, row.created_at, 1)
+            return True
+
+async def submit_application(telegram_id, username, first_name, last_name, phone, email, faculty_code):
+    """
+    Подача заявки одной транзакцией: upsert пользователя с RETURNING id и
+    вставка заявки с ON CONFLICT DO NOTHING по (user_id, faculty_code).
 
-async def get_applications_by_user_id(user_id: int):
+    Возвращает (user_id, application_id); application_id равен None,
+    если заявка на этот факультет уже была подана.
+    """
+    user_stmt = dialect_insert(User).values(
+        telegram_id=telegram_id,
+        username=username,
+        first_name=first_name,
+        last_name=last_name,
+        phone=phone,
+        email=email,
+        role='user'
+    )
+    excluded = user_stmt.excluded
+    user_stmt = user_stmt.on_conflict_do_update(
+        index_elements=[User.telegram_id],
+        set_={
+            'username': excluded.username,
+            'first_name': excluded.first_name,
+            'last_name': excluded.last_name,
+            'phone': func.coalesce(excluded.phone, User.phone),
+            'email': func.coalesce(excluded.email, User.email),
+        },
+    ).returning(User.id)
+
+    async with async_session() as session:
+        async with session.begin():
+            user_id = (await session.execute(user_stmt)).scalar_one()
+            application_id = await _insert_application(session, user_id, faculty_code)
+    user_cache.invalidate(telegram_id)
+    return user_id, application_id
+
+async def save_questionnaire(telegram_id: int, answers: dict, recommendation: dict):
     async with async_session() as session:
-        result = await session.execute(
-            select(Application).where(Application.user_id == user_id)
+        questionnaire = Questionnaire(
+            telegram_id=telegram_id,
+            answers=answers,
+            faculty_code=recommendation.get('code'),
+            confidence=recommendation.get('confidence'),
+            model_version=recommendation.get('model_version')
         )
-        return result.scalars().all()
\ No newline at end of file
+        session.add(questionnaire)
+        await session.commit()
+        return questionnaire
@@ -0,0 +1,205 @@
+import asyncio
+import copy
+import time
+from datetime import datetime, timedelta
+from typing import Any, Dict, Optional
+
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import BaseStorage, DefaultKeyBuilder, StateType, StorageKey
+from sqlalchemy import delete
+
+from backend.models.fsm_session import FsmSession
+from bot.config import Config
+from bot.utils.database import async_session, dialect_insert
+
+
+class _Session:
+    """Состояние диалога в памяти; touched — время последнего обращения."""
+    __slots__ = ('state', 'data', 'touched')
+
+    def __init__(self, state=None, data=None):
+        self.state = state
+        self.data = data or {}
+        self.touched = time.monotonic()
+
+
+class DatabaseStorage(BaseStorage):
+    """
+    FSM-хранилище в базе проекта (таблица fsm_sessions).
+
+    Состояния активных диалогов держатся в памяти, а запись в БД
+    откладывается на write_delay: серия быстрых update_data (например,
+    переключение галочек предметов) превращается в один upsert. Сессии,
+    не менявшиеся дольше ttl, удаляются периодической очисткой.
+    """
+
+    def __init__(self, session_factory=async_session, write_delay=0.5, ttl=24 * 3600.0, sweep_interval=600.0):
+        self.session_factory = session_factory
+        self.write_delay = write_delay
+        self.ttl = ttl
+        self.sweep_interval = sweep_interval
+        self.key_builder = DefaultKeyBuilder(with_bot_id=True, with_business_connection_id=True, with_destiny=True)
+        self._sessions = {}
+        self._dirty = set()
+        self._lock = asyncio.Lock()
+        self._flush_task = None
+        self._sweep_task = None
+        self.writes = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.expired = 0
+
+    async def _load(self, key):
+        db_key = self.key_builder.build(key)
+        session = self._sessions.get(db_key)
+        if session is not None:
+            session.touched = time.monotonic()
+            return db_key, session
+
+        async with self.session_factory() as db:
+            row = await db.get(FsmSession, db_key)
+        # Пока шел запрос, сессию могли создать конкурентно
+        session = self._sessions.get(db_key)
+        if session is None:
+            session = _Session(row.state, row.data) if row is not None else _Session()
+            self._sessions[db_key] = session
+        self._ensure_sweeper()
+        return db_key, session
+
+    def _mark_dirty(self, db_key, session):
+        session.touched = time.monotonic()
+        self._dirty.add(db_key)
+        self.writes += 1
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.get_running_loop().create_task(self._delayed_flush())
+
+    async def _delayed_flush(self):
+        await asyncio.sleep(self.write_delay)
+        await self.flush()
+
+    async def flush(self):
+        async with self._lock:
+            if not self._dirty:
+                return 0
+            keys, self._dirty = self._dirty, set()
+            now = datetime.utcnow()
+            rows = []
+            removed = []
+            for db_key in keys:
+                session = self._sessions.get(db_key)
+                if session is None or (session.state is None and not session.data):
+                    removed.append(db_key)
+                else:
+                    rows.append({'key': db_key, 'state': session.state, 'data': copy.deepcopy(session.data), 'updated_at': now})
+            try:
+                async with self.session_factory() as db:
+                    async with db.begin():
+                        if rows:
+                            stmt = dialect_insert(FsmSession).values(rows)
+                            stmt = stmt.on_conflict_do_update(
+                                index_elements=[FsmSession.key],
+                                set_={
+                                    'state': stmt.excluded.state,
+                                    'data': stmt.excluded.data,
+                                    'updated_at': stmt.excluded.updated_at,
+                                },
+                            )
+                            await db.execute(stmt)
+                        if removed:
+                            await db.execute(delete(FsmSession).where(FsmSession.key.in_(removed)))
+            except (Exception, asyncio.CancelledError) as e:
+                self._dirty |= keys
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                print(f"❌ Ошибка сохранения FSM-сессий: {e}")
+                return 0
+            self.flushes += 1
+            self.rows_written += len(keys)
+            return len(keys)
+
+    def _ensure_sweeper(self):
+        if self._sweep_task is None or self._sweep_task.done():
+            self._sweep_task = asyncio.get_running_loop().create_task(self._sweep_loop())
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                await self.sweep()
+            except Exception as e:
+                print(f"❌ Ошибка очистки FSM-сессий: {e}")
+
+    async def sweep(self):
+        """Удаляет брошенные сессии из БД. Возвращает число удаленных строк."""
+        # Сохраненные сессии, к которым давно не обращались, вытесняются из памяти:
+        # при следующем обращении они загрузятся из БД
+        deadline = time.monotonic() - self.sweep_interval
+        for db_key, session in list(self._sessions.items()):
+            if session.touched < deadline and db_key not in self._dirty:
+                del self._sessions[db_key]
+
+        cutoff = datetime.utcnow() - timedelta(seconds=self.ttl)
+        async with self._lock:
+            async with self.session_factory() as db:
+                result = await db.execute(
+                    delete(FsmSession)
+                    .where(FsmSession.updated_at < cutoff)
+                    .returning(FsmSession.key)
+                )
+                expired = result.scalars().all()
+                await db.commit()
+        # Сессия могла быть загружена в память до истечения срока в БД
+        for db_key in expired:
+            if db_key not in self._dirty:
+                self._sessions.pop(db_key, None)
+        self.expired += len(expired)
+        return len(expired)
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        db_key, session = await self._load(key)
+        session.state = state.state if isinstance(state, State) else state
+        self._mark_dirty(db_key, session)
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        _, session = await self._load(key)
+        return session.state
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        if not isinstance(data, dict):
+            raise ValueError(f"Data must be a dict, got {type(data).__name__}")
+        db_key, session = await self._load(key)
+        session.data = data.copy()
+        self._mark_dirty(db_key, session)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        _, session = await self._load(key)
+        return session.data.copy()
+
+    def stats(self):
+        return {
+            'sessions_in_memory': len(self._sessions),
+            'dirty': len(self._dirty),
+            'writes': self.writes,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'expired': self.expired,
+        }
+
+    async def close(self) -> None:
+        for task in (self._flush_task, self._sweep_task):
+            if task is not None and not task.done():
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        await self.flush()
+        print(f"💾 FSM-сессии сохранены: {self.stats()}")
+
+
+def create_fsm_storage():
+    return DatabaseStorage(
+        write_delay=Config.FSM_WRITE_DELAY,
+        ttl=Config.FSM_SESSION_TTL,
+        sweep_interval=Config.FSM_SWEEP_INTERVAL,
+    )
@@ -0,0 +1,141 @@
+import asyncio
+import hashlib
+from collections import OrderedDict
+
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
+from bot.config import Config
+
+
+def markup_hash(markup):
+    if markup is None:
+        return None
+    payload = markup.model_dump_json(exclude_none=True)
+    return hashlib.blake2b(payload.encode(), digest_size=16).hexdigest()
+
+
+class EditCoordinator:
+    """
+    Координатор правок клавиатуры сообщения.
+
+    Первая правка сообщения откладывается на delay; нажатия, пришедшие за это
+    время, только заменяют ожидающую клавиатуру, и в Telegram уходит одна
+    правка с последней версией. Правка, не меняющая клавиатуру, не отправляется.
+    """
+
+    def __init__(self, delay=0.3, max_tracked=10000):
+        self.delay = delay
+        self.max_tracked = max_tracked
+        self._pending = {}
+        self._tasks = {}
+        self._sending = set()
+        self._discarded = set()
+        self._sent_hashes = OrderedDict()
+        self.requested = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.skipped = 0
+        self.not_modified = 0
+        self.retries = 0
+        self.failed = 0
+
+    @staticmethod
+    def _key(message):
+        return message.chat.id, message.message_id
+
+    def _remember(self, key, digest):
+        self._sent_hashes[key] = digest
+        self._sent_hashes.move_to_end(key)
+        while len(self._sent_hashes) > self.max_tracked:
+            self._sent_hashes.popitem(last=False)
+
+    def edit_markup(self, message, markup):
+        """Ставит правку клавиатуры в очередь; ответ на callback можно давать сразу."""
+        self.requested += 1
+        key = self._key(message)
+        if key not in self._sent_hashes:
+            # Базовая версия — клавиатура, которую Telegram прислал вместе с сообщением
+            self._remember(key, markup_hash(message.reply_markup))
+        if key in self._pending:
+            self.coalesced += 1
+        self._discarded.discard(key)
+        self._pending[key] = (message, markup)
+        task = self._tasks.get(key)
+        if task is None or task.done():
+            self._tasks[key] = asyncio.get_running_loop().create_task(self._send_later(key))
+
+    async def _send_later(self, key):
+        try:
+            await asyncio.sleep(self.delay)
+            while key in self._pending:
+                message, markup = self._pending.pop(key)
+                digest = markup_hash(markup)
+                if digest == self._sent_hashes.get(key):
+                    self.skipped += 1
+                    continue
+                retry = None
+                self._sending.add(key)
+                try:
+                    await message.edit_reply_markup(reply_markup=markup)
+                    self.sent += 1
+                    self._remember(key, digest)
+                except TelegramRetryAfter as e:
+                    self.retries += 1
+                    # После discard() повторять нечего: сообщение уже меняется иначе
+                    if key not in self._discarded:
+                        retry = e.retry_after, message, markup
+                except TelegramBadRequest as e:
+                    if "message is not modified" in str(e):
+                        self.not_modified += 1
+                        self._remember(key, digest)
+                    else:
+                        self.failed += 1
+                        print(f"⚠️ Не удалось обновить клавиатуру: {e}")
+                finally:
+                    self._sending.discard(key)
+                if retry is not None:
+                    retry_after, message, markup = retry
+                    await asyncio.sleep(retry_after)
+                    # Новая клавиатура, пришедшая за время ожидания, важнее
+                    if key not in self._discarded and key not in self._pending:
+                        self._pending[key] = (message, markup)
+        finally:
+            if self._tasks.get(key) is asyncio.current_task():
+                del self._tasks[key]
+                self._discarded.discard(key)
+
+    async def discard(self, message):
+        """
+        Отменяет ожидающую правку перед тем, как сообщение будет изменено
+        другим способом, и дожидается уже начатой отправки.
+        """
+        key = self._key(message)
+        self._pending.pop(key, None)
+        task = self._tasks.get(key)
+        if task is not None and not task.done():
+            if key in self._sending:
+                # Запрос уже ушел в Telegram: дожидаемся ответа, повторов после него не будет
+                self._discarded.add(key)
+                await asyncio.shield(task)
+            else:
+                task.cancel()
+                try:
+                    await task
+                except asyncio.CancelledError:
+                    pass
+        self._sent_hashes.pop(key, None)
+
+    def stats(self):
+        return {
+            'pending': len(self._pending),
+            'requested': self.requested,
+            'sent': self.sent,
+            'coalesced': self.coalesced,
+            'skipped': self.skipped,
+            'not_modified': self.not_modified,
+            'retries': self.retries,
+            'failed': self.failed,
+        }
+
+
+edit_coordinator = EditCoordinator(delay=Config.EDIT_DEBOUNCE_MS / 1000)
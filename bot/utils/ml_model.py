@@ -1,44 +1,156 @@
-from bot.ml.tusur_model import faculty_predictor
-from bot.data.subjects import SCHOOL_SUBJECTS, EXAM_SUBJECTS
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-async def get_faculty_recommendation(user_data):
+from bot.data import subject_masks
+from bot.config import Config
+from bot.utils.startup_timing import startup_timer
 
-    favorite_subjects_codes = user_data.get('selected_favorite_subjects', [])
-    disliked_subjects_codes = user_data.get('selected_disliked_subjects', [])
-    exam_codes = user_data.get('selected_exams', [])
+# ML-стек (numpy, sklearn, pymorphy3) импортируется лениво в фоне после старта
+# поллинга; пока модель не готова, работает simple_faculty_recommendation
+faculty_predictor = None
+ml_ready = False
+training_job = None
+# В режиме supervisor обучение идет в супервизоре, воркеры получают его статус
+supervisor_training_status = None
+_warm_up_task = None
 
-    favorite_subjects = []
-    for code in favorite_subjects_codes:
-        if code in SCHOOL_SUBJECTS:
-            favorite_subjects.append(code)
-    
-    disliked_subjects = []
-    for code in disliked_subjects_codes:
-        if code in SCHOOL_SUBJECTS:
-            disliked_subjects.append(code)
-
-    exams = []
-    for code in exam_codes:
-        if code in EXAM_SUBJECTS:
-            clean_code = code.replace('_ege', '').replace('_oge', '')
-            exams.append(clean_code)
-
-    ml_input = {
-        'liked_subjects': favorite_subjects,
-        'disliked_subjects': disliked_subjects,
-        'exams': exams,
+
+class InferenceBatcher:
+    """
+    Очередь инференса вне event loop.
+
+    Запросы, пришедшие в пределах окна max_wait_ms, собираются в один батч
+    (не больше max_batch_size) и обрабатываются одним прямым проходом модели
+    в отдельном потоке. Каждый вызывающий получает свой результат через future.
+    """
+
+    def __init__(self, predict_batch, max_batch_size=32, max_wait_ms=10.0):
+        self.predict_batch = predict_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="ml-inference")
+        self._queue = None
+        self._worker = None
+        self._requests = 0
+        self._batches = 0
+        self._max_batch_seen = 0
+        self._inference_seconds = 0.0
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def predict(self, ml_input):
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((ml_input, future))
+        return await future
+
+    async def _collect_batch(self):
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect_batch()
+            batch = [(ml_input, future) for ml_input, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            started = time.perf_counter()
+            try:
+                results = await loop.run_in_executor(
+                    self._executor, self.predict_batch, [ml_input for ml_input, _ in batch]
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            finally:
+                self._inference_seconds += time.perf_counter() - started
+                self._requests += len(batch)
+                self._batches += 1
+                self._max_batch_seen = max(self._max_batch_seen, len(batch))
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    def stats(self):
+        return {
+            'queue_depth': self._queue.qsize() if self._queue else 0,
+            'requests': self._requests,
+            'batches': self._batches,
+            'avg_batch_size': self._requests / self._batches if self._batches else 0.0,
+            'max_batch_size': self._max_batch_seen,
+            'avg_batch_ms': 1000 * self._inference_seconds / self._batches if self._batches else 0.0,
+        }
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        self._executor.shutdown(wait=False)
+
+
+def _predict_batch(ml_inputs):
+    return faculty_predictor.predict_batch(ml_inputs)
+
+
+inference_service = InferenceBatcher(
+    _predict_batch,
+    max_batch_size=Config.ML_BATCH_SIZE,
+    max_wait_ms=Config.ML_BATCH_WAIT_MS,
+)
+
+
+def build_ml_input(user_data):
+    # Маски выбора передаются модели как есть: их биты совпадают с раскладкой признаков
+    return {
+        'liked_subjects': subject_masks.to_mask('school', user_data.get('selected_favorite_subjects', 0)),
+        'disliked_subjects': subject_masks.to_mask('school', user_data.get('selected_disliked_subjects', 0)),
+        'exams': subject_masks.exams_to_school_mask(
+            subject_masks.to_mask('exam', user_data.get('selected_exams', 0))
+        ),
         'interests': user_data.get('interests', ''),
         'not_interests': user_data.get('dislikes', '')
     }
+
+
+async def get_faculty_recommendation(user_data):
+    if not ml_ready:
+        return await simple_faculty_recommendation(user_data)
+
+    ml_input = build_ml_input(user_data)
     
     try:
-        prediction = faculty_predictor.predict_faculty(ml_input)
+        prediction = await inference_service.predict(ml_input)
 
         return {
             'code': prediction['code'],
             'name': prediction['name'],
             'reason': prediction['reason'],
-            'directions': prediction['directions']
+            'directions': prediction['directions'],
+            'confidence': prediction['confidence'],
+            'model_version': prediction.get('model_version')
         }
         
     except Exception as e:
@@ -47,9 +159,7 @@ async def get_faculty_recommendation(user_data):
 
 async def simple_faculty_recommendation(user_data):
 
-    from bot.config import Config
-    
-    favorite_subjects_codes = user_data.get('selected_favorite_subjects', [])
+    favorite_subjects_codes = subject_masks.to_codes('school', user_data.get('selected_favorite_subjects', 0))
     interests = user_data.get('interests', '').lower()
 
     if 'информатика' in favorite_subjects_codes or any(word in interests for word in ['программирование', 'кодинг', 'разработка', 'алгоритмы']):
@@ -95,13 +205,78 @@ async def simple_faculty_recommendation(user_data):
             'directions': '• Информационные технологии\n• Цифровая экономика\n• Инновационные проекты\n• Современные технологии'
         }
 
-async def initialize_ml_model():
+def _load_ml_model():
+    with startup_timer.phase("импорт ML"):
+        from bot.ml.tusur_model import TusurFacultyPredictor
+
+    with startup_timer.phase("загрузка модели"):
+        predictor = TusurFacultyPredictor()
+        loaded = predictor.load_model()
+
+    return predictor if loaded else None
+
+
+async def reload_ml_model():
+    """Загружает модель с диска и подменяет ей работающий предиктор."""
+    global faculty_predictor, ml_ready
+    predictor = await asyncio.get_running_loop().run_in_executor(None, _load_ml_model)
+    if predictor is None:
+        return False
+    from bot.ml.prediction_cache import prediction_cache
+    prediction_cache.set_model_version(predictor.model_version)
+    restored = prediction_cache.load()
+    if restored:
+        print(f"♻️ Восстановлено {restored} записей кэша рекомендаций")
+
+    faculty_predictor = predictor
+    ml_ready = True
+    return True
+
+
+def model_status():
+    """Загружена ли модель и как идет фоновое обучение (если оно запускалось)."""
+    return {
+        'ready': ml_ready,
+        'model_version': getattr(faculty_predictor, 'model_version', None) if ml_ready else None,
+        'training': training_job.status() if training_job is not None else supervisor_training_status,
+    }
+
+
+async def run_training_job(num_samples=1500, rescore=True):
+    global training_job
+    from bot.ml.training_job import TrainingJob
+
+    training_job = TrainingJob(num_samples=num_samples)
+    if await training_job.run():
+        if await reload_ml_model():
+            print("✅ Новая ML модель подключена без перезапуска")
+            if rescore:
+                from bot.ml.rescoring import rescore_questionnaires
+                await rescore_questionnaires(faculty_predictor)
+            return True
+    return False
+
+
+async def initialize_ml_model(train_if_missing=True):
     try:
-        if not faculty_predictor.load_model():
-            print("🤖 Первый запуск ML модели - начинаем обучение...")
-            faculty_predictor.train_model(num_samples=1500)
-            faculty_predictor.save_model()
-        print("✅ ML модель готова к работе!")
+        if await reload_ml_model():
+            print("✅ ML модель готова к работе!")
+            startup_timer.report("Время запуска (ML)")
+            return
+        startup_timer.report("Время запуска (ML)")
+        if not train_if_missing:
+            print("⏳ Модель еще не обучена, до ее появления используется простая логика")
+            return
+        print("🤖 Первый запуск ML модели - обучение в фоновом процессе...")
+        print("До его окончания используется простая логика как fallback")
+        await run_training_job()
     except Exception as e:
         print(f"⚠️ Ошибка инициализации ML модели: {e}")
         print("Будет использоваться простая логика как fallback")
+
+
+def start_ml_warm_up(train_if_missing=True):
+    global _warm_up_task
+    if _warm_up_task is None:
+        _warm_up_task = asyncio.get_running_loop().create_task(initialize_ml_model(train_if_missing))
+    return _warm_up_task
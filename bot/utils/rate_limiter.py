@@ -0,0 +1,326 @@
+import asyncio
+import contextvars
+import heapq
+import itertools
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from aiogram.client.session.middlewares.base import BaseRequestMiddleware
+from aiogram.exceptions import TelegramRetryAfter
+from aiogram.methods import (
+    AnswerCallbackQuery,
+    AnswerInlineQuery,
+    Close,
+    DeleteMessage,
+    DeleteWebhook,
+    EditMessageCaption,
+    EditMessageReplyMarkup,
+    EditMessageText,
+    GetMe,
+    GetUpdates,
+    GetWebhookInfo,
+    LogOut,
+    SetWebhook,
+)
+
+from bot.config import Config
+
+# Чем меньше число, тем раньше запрос уйдет в Telegram
+PRIORITY_ANSWER = 0
+PRIORITY_EDIT = 1
+PRIORITY_SEND = 2
+PRIORITY_BULK = 3
+PRIORITY_NAMES = {
+    PRIORITY_ANSWER: 'answer',
+    PRIORITY_EDIT: 'edit',
+    PRIORITY_SEND: 'send',
+    PRIORITY_BULK: 'bulk',
+}
+
+_METHOD_PRIORITIES = {
+    AnswerCallbackQuery: PRIORITY_ANSWER,
+    AnswerInlineQuery: PRIORITY_ANSWER,
+    EditMessageText: PRIORITY_EDIT,
+    EditMessageReplyMarkup: PRIORITY_EDIT,
+    EditMessageCaption: PRIORITY_EDIT,
+    DeleteMessage: PRIORITY_EDIT,
+}
+# Служебные методы не ограничиваются: getUpdates — это long polling
+_UNLIMITED_METHODS = (GetUpdates, GetMe, GetWebhookInfo, SetWebhook, DeleteWebhook, LogOut, Close)
+
+_priority_override = contextvars.ContextVar('outbound_priority', default=None)
+
+
+@contextmanager
+def outbound_priority(priority):
+    """Задает приоритет запросов внутри блока, например PRIORITY_BULK для рассылок."""
+    token = _priority_override.set(priority)
+    try:
+        yield
+    finally:
+        _priority_override.reset(token)
+
+
+class _TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated', 'blocked_until')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = now
+        self.blocked_until = 0.0
+
+    def _refill(self, now):
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def delay(self, now):
+        """Через сколько секунд можно будет отправить запрос."""
+        self._refill(now)
+        wait = self.blocked_until - now
+        if self.tokens < 1:
+            wait = max(wait, (1 - self.tokens) / self.rate)
+        return max(0.0, wait)
+
+    def consume(self, now):
+        self._refill(now)
+        self.tokens -= 1
+
+    def block(self, now, seconds):
+        self.blocked_until = max(self.blocked_until, now + seconds)
+
+    def idle(self, now):
+        self._refill(now)
+        return self.tokens >= self.capacity and self.blocked_until <= now
+
+
+class _Waiter:
+    __slots__ = ('chat_id', 'future', 'enqueued')
+
+    def __init__(self, chat_id, future, enqueued):
+        self.chat_id = chat_id
+        self.future = future
+        self.enqueued = enqueued
+
+
+class RateLimitMiddleware(BaseRequestMiddleware):
+    """
+    Ограничитель исходящих запросов к Bot API.
+
+    Каждый запрос ждет токен общего ведра (лимит бота целиком) и ведра своего
+    чата. Ожидающие запросы выдаются по приоритету: ответы на callback раньше
+    правок, правки раньше отправки сообщений, рассылки последними. Запрос в
+    чат, который сейчас ограничен, не задерживает запросы в другие чаты.
+    На 429 чат ставится на паузу retry_after, после чего запрос повторяется
+    до max_retries раз. Если 429 приходит сразу в нескольких чатах (или у
+    запроса нет чата), на паузу ставится весь бот.
+    """
+
+    def __init__(self, global_rate=30.0, global_burst=30.0, chat_rate=1.0, chat_burst=5.0,
+                 group_rate=20 / 60, max_retries=3, max_chat_buckets=100000):
+        self.global_rate = global_rate
+        self.global_burst = global_burst
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate
+        self.max_retries = max_retries
+        self.max_chat_buckets = max_chat_buckets
+        self._global = _TokenBucket(global_rate, global_burst, time.monotonic())
+        self._chats = {}
+        self._floods = {}
+        self._queue = []
+        self._seq = itertools.count()
+        self._wake = None
+        self._worker = None
+        self.requests = 0
+        self.retries = 0
+        self.flood_errors = 0
+        self._latency = {priority: deque(maxlen=1024) for priority in PRIORITY_NAMES}
+        self._granted = dict.fromkeys(PRIORITY_NAMES, 0)
+        self._max_latency = dict.fromkeys(PRIORITY_NAMES, 0.0)
+
+    def set_global_rate(self, rate, burst):
+        """Меняет общий лимит, например когда его делят несколько процессов бота."""
+        self.global_rate = rate
+        self.global_burst = burst
+        self._global = _TokenBucket(rate, burst, time.monotonic())
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._wake = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    @staticmethod
+    def _priority(method):
+        override = _priority_override.get()
+        if override is not None:
+            return override
+        return _METHOD_PRIORITIES.get(type(method), PRIORITY_SEND)
+
+    def _chat_bucket(self, chat_id, now):
+        if chat_id is None:
+            return None
+        bucket = self._chats.get(chat_id)
+        if bucket is None:
+            if len(self._chats) >= self.max_chat_buckets:
+                # Полные ведра ничего не помнят: их можно выбросить без потери лимитов
+                for key in [key for key, b in self._chats.items() if b.idle(now)]:
+                    del self._chats[key]
+            is_group = isinstance(chat_id, int) and chat_id < 0
+            rate = self.group_rate if is_group else self.chat_rate
+            bucket = _TokenBucket(rate, 1.0 if is_group else self.chat_burst, now)
+            self._chats[chat_id] = bucket
+        return bucket
+
+    async def _acquire(self, priority, chat_id):
+        self._ensure_started()
+        waiter = _Waiter(chat_id, asyncio.get_running_loop().create_future(), time.monotonic())
+        heapq.heappush(self._queue, (priority, next(self._seq), waiter))
+        self._wake.set()
+        await waiter.future
+
+    async def _sleep(self, seconds):
+        try:
+            await asyncio.wait_for(self._wake.wait(), timeout=seconds)
+        except asyncio.TimeoutError:
+            pass
+
+    async def _run(self):
+        while True:
+            self._wake.clear()
+            if not self._queue:
+                await self._wake.wait()
+                continue
+
+            now = time.monotonic()
+            wait = self._global.delay(now)
+            if wait > 0:
+                await asyncio.sleep(wait)
+                continue
+
+            granted = None
+            deferred = []
+            next_ready = None
+            while self._queue:
+                item = heapq.heappop(self._queue)
+                priority, _, waiter = item
+                if waiter.future.done():
+                    # Вызывающий отменил запрос, пока тот ждал в очереди
+                    continue
+                bucket = self._chat_bucket(waiter.chat_id, now)
+                wait = bucket.delay(now) if bucket is not None else 0.0
+                if wait <= 0:
+                    granted = item, bucket
+                    break
+                deferred.append(item)
+                next_ready = wait if next_ready is None else min(next_ready, wait)
+            for item in deferred:
+                heapq.heappush(self._queue, item)
+
+            if granted is None:
+                if next_ready is not None:
+                    await self._sleep(next_ready)
+                continue
+
+            (priority, _, waiter), bucket = granted
+            self._global.consume(now)
+            if bucket is not None:
+                bucket.consume(now)
+            latency = now - waiter.enqueued
+            self._latency[priority].append(latency)
+            self._granted[priority] += 1
+            self._max_latency[priority] = max(self._max_latency[priority], latency)
+            waiter.future.set_result(None)
+
+    def _pause(self, chat_id, seconds):
+        now = time.monotonic()
+        bucket = self._chat_bucket(chat_id, now)
+        if bucket is None:
+            self._global.block(now, seconds)
+            return
+        bucket.block(now, seconds)
+        # 429 сразу в нескольких чатах означает, что Telegram ограничил весь бот
+        self._floods = {key: until for key, until in self._floods.items() if until > now}
+        if self._floods.keys() - {chat_id}:
+            self._global.block(now, seconds)
+        self._floods[chat_id] = now + seconds
+
+    async def __call__(self, make_request, bot, method):
+        if isinstance(method, _UNLIMITED_METHODS):
+            return await make_request(bot, method)
+
+        self.requests += 1
+        priority = self._priority(method)
+        chat_id = getattr(method, 'chat_id', None)
+        attempt = 0
+        while True:
+            await self._acquire(priority, chat_id)
+            try:
+                return await make_request(bot, method)
+            except TelegramRetryAfter as e:
+                self.flood_errors += 1
+                self._pause(chat_id, e.retry_after)
+                if attempt >= self.max_retries:
+                    raise
+                attempt += 1
+                self.retries += 1
+
+    def stats(self):
+        latency = {}
+        for priority, name in PRIORITY_NAMES.items():
+            samples = sorted(self._latency[priority])
+            if not self._granted[priority]:
+                continue
+            latency[name] = {
+                'granted': self._granted[priority],
+                'p50_ms': round(samples[len(samples) // 2] * 1000, 1),
+                'p95_ms': round(samples[int(len(samples) * 0.95)] * 1000, 1),
+                'max_ms': round(self._max_latency[priority] * 1000, 1),
+            }
+        return {
+            'queued': len(self._queue),
+            'requests': self.requests,
+            'retries': self.retries,
+            'flood_errors': self.flood_errors,
+            'chat_buckets': len(self._chats),
+            'latency': latency,
+        }
+
+    async def close(self):
+        if self._worker is not None and not self._worker.done():
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+        # Запросы, оставшиеся в очереди при остановке, отменяются
+        while self._queue:
+            _, _, waiter = heapq.heappop(self._queue)
+            if not waiter.future.done():
+                waiter.future.cancel()
+
+
+outbound_limiter = RateLimitMiddleware(
+    global_rate=Config.TG_GLOBAL_RATE,
+    global_burst=Config.TG_GLOBAL_BURST,
+    chat_rate=Config.TG_CHAT_RATE,
+    chat_burst=Config.TG_CHAT_BURST,
+    group_rate=Config.TG_GROUP_RATE,
+    max_retries=Config.TG_MAX_RETRIES,
+)
+
+
+def create_bot_session(api_url=None, limiter=None):
+    """HTTP-сессия бота с ограничителем; TELEGRAM_API_URL позволяет указать свой (или тестовый) Bot API сервер."""
+    from aiogram.client.session.aiohttp import AiohttpSession
+    from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+
+    api_url = Config.TELEGRAM_API_URL if api_url is None else api_url
+    api = TelegramAPIServer.from_base(api_url) if api_url else PRODUCTION
+    session = AiohttpSession(api=api)
+    session.middleware(limiter or outbound_limiter)
+    return session
+
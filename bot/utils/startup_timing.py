@@ -0,0 +1,33 @@
+import logging
+import time
+from contextlib import contextmanager
+
+
+class StartupTimer:
+    """Замеры фаз запуска бота (импорт, инициализация БД, загрузка модели)."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.phases = {}
+
+    @contextmanager
+    def phase(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases[name] = time.perf_counter() - started
+
+    def mark_since_start(self, name):
+        self.phases[name] = time.perf_counter() - self.started
+
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def report(self, title="Время запуска"):
+        lines = [f"⏱ {title}: {self.elapsed():.2f} с"]
+        lines += [f"  • {name}: {seconds:.2f} с" for name, seconds in self.phases.items()]
+        logging.info("\n".join(lines))
+
+
+startup_timer = StartupTimer()
@@ -0,0 +1,108 @@
+import sys
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, fields
+from typing import Optional
+
+from bot.config import Config
+
+
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Неизменяемая копия строки users, не привязанная к сессии."""
+    id: int
+    telegram_id: int
+    username: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    phone: Optional[str]
+    email: Optional[str]
+    role: Optional[str]
+    is_active: Optional[bool]
+
+    @classmethod
+    def from_orm(cls, user):
+        return cls(**{f.name: getattr(user, f.name) for f in fields(cls)})
+
+    def size_bytes(self):
+        return sys.getsizeof(self) + sum(sys.getsizeof(getattr(self, f.name)) for f in fields(self))
+
+
+class UserCache:
+    """
+    Кэш пользователей по telegram_id: LRU с ограничением размера и TTL.
+
+    Записи сбрасываются при любой записи профиля. Чтение, начатое до сброса,
+    не может положить в кэш устаревшую копию: put сверяет эпоху загрузки.
+    """
+
+    def __init__(self, maxsize=10000, ttl=300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._invalidated = OrderedDict()
+        self._epoch = 0
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.expired = 0
+        self.invalidations = 0
+
+    def get(self, telegram_id):
+        entry = self._entries.get(telegram_id)
+        if entry is None:
+            self.misses += 1
+            return None
+        snapshot, expires_at = entry
+        if expires_at <= time.monotonic():
+            del self._entries[telegram_id]
+            self.expired += 1
+            self.misses += 1
+            return None
+        self._entries.move_to_end(telegram_id)
+        self.hits += 1
+        return snapshot
+
+    def begin_load(self):
+        return self._epoch
+
+    def put(self, telegram_id, snapshot, token):
+        if self._invalidated.get(telegram_id, self._floor) > token:
+            return
+        self._entries[telegram_id] = (snapshot, time.monotonic() + self.ttl)
+        self._entries.move_to_end(telegram_id)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def invalidate(self, *telegram_ids):
+        self._epoch += 1
+        for telegram_id in telegram_ids:
+            self._entries.pop(telegram_id, None)
+            self._invalidated[telegram_id] = self._epoch
+            self._invalidated.move_to_end(telegram_id)
+            self.invalidations += 1
+        while len(self._invalidated) > self.maxsize:
+            _, epoch = self._invalidated.popitem(last=False)
+            self._floor = max(self._floor, epoch)
+
+    def clear(self):
+        self.invalidate(*self._entries)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self._entries),
+            'maxsize': self.maxsize,
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'expired': self.expired,
+            'invalidations': self.invalidations,
+            'memory_bytes': sum(
+                sys.getsizeof(key) + snapshot.size_bytes()
+                for key, (snapshot, _) in self._entries.items()
+            ),
+        }
+
+
+user_cache = UserCache(maxsize=Config.USER_CACHE_SIZE, ttl=Config.USER_CACHE_TTL)
@@ -0,0 +1,145 @@
+import asyncio
+import time
+from collections import OrderedDict
+
+from bot.config import Config
+from bot.utils.database import upsert_users
+
+
+class UserWriteBuffer:
+    """
+    Отложенная запись профилей пользователей из /start.
+
+    Если имя и username не изменились с последней записи, запрос к БД не
+    выполняется вовсе. Изменения копятся в буфере (по одному на пользователя)
+    и сбрасываются пачкой одним INSERT ... ON CONFLICT(telegram_id) DO UPDATE:
+    по таймеру, при заполнении буфера и при остановке бота.
+    """
+
+    def __init__(self, batch_size=200, flush_interval=1.0, known_size=100000):
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.known_size = known_size
+        self._pending = {}
+        self._inflight = set()
+        self._known = OrderedDict()
+        self._lock = None
+        self._wake = None
+        self._worker = None
+        self.touches = 0
+        self.elided = 0
+        self.flushes = 0
+        self.rows_written = 0
+        self.errors = 0
+        self.last_flush_ms = 0.0
+        self.max_flush_ms = 0.0
+        self._flush_seconds = 0.0
+
+    def _ensure_started(self):
+        if self._worker is None or self._worker.done():
+            self._lock = asyncio.Lock()
+            self._wake = asyncio.Event()
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    def _remember(self, telegram_id, profile):
+        self._known[telegram_id] = profile
+        self._known.move_to_end(telegram_id)
+        while len(self._known) > self.known_size:
+            self._known.popitem(last=False)
+
+    def touch(self, telegram_id, username, first_name, last_name):
+        """Ставит профиль в очередь на запись. Возвращает False, если запись не нужна."""
+        self.touches += 1
+        profile = (username, first_name, last_name)
+        if self._pending.get(telegram_id, self._known.get(telegram_id)) == profile:
+            self.elided += 1
+            return False
+
+        self._ensure_started()
+        self._pending[telegram_id] = profile
+        if len(self._pending) >= self.batch_size:
+            self._wake.set()
+        return True
+
+    async def flush_if_pending(self, telegram_id):
+        """Дописывает профиль пользователя, если он еще в буфере (read-your-writes)."""
+        if telegram_id in self._pending or telegram_id in self._inflight:
+            await self.flush()
+
+    async def flush(self):
+        if self._lock is None:
+            return 0
+        async with self._lock:
+            if not self._pending:
+                return 0
+            batch, self._pending = self._pending, {}
+            self._inflight = set(batch)
+            rows = [
+                {'telegram_id': telegram_id, 'username': username,
+                 'first_name': first_name, 'last_name': last_name, 'role': 'user'}
+                for telegram_id, (username, first_name, last_name) in batch.items()
+            ]
+            started = time.perf_counter()
+            try:
+                for i in range(0, len(rows), self.batch_size):
+                    await upsert_users(rows[i:i + self.batch_size])
+            except (Exception, asyncio.CancelledError) as e:
+                # Более свежие изменения, пришедшие во время записи, не затираем
+                for telegram_id, profile in batch.items():
+                    self._pending.setdefault(telegram_id, profile)
+                if isinstance(e, asyncio.CancelledError):
+                    raise
+                self.errors += 1
+                print(f"❌ Ошибка записи профилей ({len(rows)} шт.): {e}")
+                return 0
+            finally:
+                self._inflight = set()
+
+            elapsed = time.perf_counter() - started
+            self.flushes += 1
+            self.rows_written += len(rows)
+            self.last_flush_ms = elapsed * 1000
+            self.max_flush_ms = max(self.max_flush_ms, self.last_flush_ms)
+            self._flush_seconds += elapsed
+            for telegram_id, profile in batch.items():
+                self._remember(telegram_id, profile)
+            return len(rows)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            await self.flush()
+
+    def stats(self):
+        return {
+            'depth': len(self._pending),
+            'touches': self.touches,
+            'elided': self.elided,
+            'flushes': self.flushes,
+            'rows_written': self.rows_written,
+            'errors': self.errors,
+            'last_flush_ms': round(self.last_flush_ms, 2),
+            'avg_flush_ms': round(self._flush_seconds * 1000 / self.flushes, 2) if self.flushes else 0.0,
+            'max_flush_ms': round(self.max_flush_ms, 2),
+        }
+
+    async def stop(self):
+        if self._worker is not None:
+            self._worker.cancel()
+            try:
+                await self._worker
+            except asyncio.CancelledError:
+                pass
+            self._worker = None
+        await self.flush()
+
+
+user_write_buffer = UserWriteBuffer(
+    batch_size=Config.USER_WRITE_BATCH_SIZE,
+    flush_interval=Config.USER_WRITE_FLUSH_INTERVAL,
+    known_size=Config.USER_TOUCH_CACHE_SIZE,
+)
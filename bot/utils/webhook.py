@@ -0,0 +1,153 @@
+import asyncio
+import secrets
+import signal
+import time
+from contextlib import suppress
+
+from aiogram.methods import TelegramMethod
+from aiohttp import web
+
+from bot.config import Config
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+class WebhookServer:
+    """
+    Прием обновлений через webhook.
+
+    Запрос с неверным секретом отклоняется. Обновление передается диспетчеру
+    в фоновой задаче, и Telegram сразу получает ответ. Одновременно
+    обрабатывается не больше max_in_flight обновлений: когда все слоты
+    заняты, ответ задерживается, и Telegram сам сбавляет темп доставки.
+    При остановке новые обновления получают 503 (Telegram доставит их
+    повторно), а начатые дорабатываются в пределах drain_timeout.
+    """
+
+    def __init__(self, dispatcher, bot, path, secret_token, max_in_flight=100, drain_timeout=25.0):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.path = path
+        self.secret_token = secret_token
+        self.max_in_flight = max(1, max_in_flight)
+        self.drain_timeout = drain_timeout
+        self._slots = asyncio.Semaphore(self.max_in_flight)
+        self._tasks = set()
+        self._draining = False
+        self.received = 0
+        self.rejected = 0
+        self.failed = 0
+        self.max_slot_wait_ms = 0.0
+
+    def create_app(self):
+        app = web.Application()
+        app.router.add_post(self.path, self.handle)
+        app.router.add_get("/healthz", self.health)
+        return app
+
+    async def handle(self, request):
+        token = request.headers.get(SECRET_HEADER, "")
+        if not secrets.compare_digest(token, self.secret_token):
+            self.rejected += 1
+            return web.Response(status=401)
+        if self._draining:
+            return web.Response(status=503)
+
+        update = await request.json(loads=self.bot.session.json_loads)
+        started = time.monotonic()
+        await self._slots.acquire()
+        if self._draining:
+            # Остановка началась, пока запрос ждал свободного слота
+            self._slots.release()
+            return web.Response(status=503)
+        self.max_slot_wait_ms = max(self.max_slot_wait_ms, (time.monotonic() - started) * 1000)
+        self.received += 1
+        task = asyncio.create_task(self._process(update))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return web.json_response({})
+
+    async def _process(self, update):
+        try:
+            result = await self.dispatcher.feed_raw_update(bot=self.bot, update=update)
+            if isinstance(result, TelegramMethod):
+                await self.dispatcher.silent_call_request(bot=self.bot, result=result)
+        except Exception as e:
+            self.failed += 1
+            print(f"❌ Ошибка обработки обновления: {e}")
+        finally:
+            self._slots.release()
+
+    async def health(self, request):
+        return web.json_response(self.stats(), status=503 if self._draining else 200)
+
+    async def drain(self):
+        """Перестает принимать обновления и дожидается начатых."""
+        self._draining = True
+        if not self._tasks:
+            return
+        done, pending = await asyncio.wait(set(self._tasks), timeout=self.drain_timeout)
+        for task in pending:
+            task.cancel()
+        for task in pending:
+            with suppress(asyncio.CancelledError):
+                await task
+        if pending:
+            print(f"⚠️ Не дождались обработки {len(pending)} обновлений при остановке")
+
+    def stats(self):
+        return {
+            'in_flight': len(self._tasks),
+            'max_in_flight': self.max_in_flight,
+            'received': self.received,
+            'rejected': self.rejected,
+            'failed': self.failed,
+            'max_slot_wait_ms': round(self.max_slot_wait_ms, 1),
+            'draining': self._draining,
+        }
+
+
+async def run_webhook(dispatcher, bot):
+    """Запускает aiohttp-сервер, регистрирует webhook и работает до SIGINT/SIGTERM."""
+    secret_token = Config.WEBHOOK_SECRET
+    if not secret_token:
+        secret_token = secrets.token_urlsafe(32)
+        print("⚠️ WEBHOOK_SECRET не задан, используется случайный секрет до перезапуска")
+    server = WebhookServer(
+        dispatcher,
+        bot,
+        path=Config.WEBHOOK_PATH,
+        secret_token=secret_token,
+        max_in_flight=Config.WEBHOOK_MAX_IN_FLIGHT,
+        drain_timeout=Config.WEBHOOK_DRAIN_TIMEOUT,
+    )
+    runner = web.AppRunner(server.create_app(), handle_signals=False)
+    await runner.setup()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    await dispatcher.emit_startup(bot=bot, dispatcher=dispatcher)
+    try:
+        site = web.TCPSite(runner, Config.WEBHOOK_HOST, Config.WEBHOOK_PORT)
+        await site.start()
+        await bot.set_webhook(
+            url=Config.WEBHOOK_BASE_URL.rstrip("/") + Config.WEBHOOK_PATH,
+            secret_token=secret_token,
+            allowed_updates=dispatcher.resolve_used_update_types(),
+            max_connections=Config.WEBHOOK_MAX_CONNECTIONS,
+        )
+        print(f"🌐 Webhook слушает {Config.WEBHOOK_HOST}:{Config.WEBHOOK_PORT}{Config.WEBHOOK_PATH}")
+        await stop.wait()
+    finally:
+        # Webhook не снимается: Telegram придержит обновления до следующего запуска
+        await server.drain()
+        await runner.cleanup()
+        print(f"📊 Webhook: {server.stats()}")
+        try:
+            await dispatcher.emit_shutdown(bot=bot, dispatcher=dispatcher)
+        finally:
+            await bot.session.close()
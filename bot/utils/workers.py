@@ -0,0 +1,493 @@
+import asyncio
+import json
+import logging
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+import zlib
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import suppress
+
+from bot.config import Config
+
+REPORT_EVERY = 1.0
+MIN_HEALTHY_UPTIME = 10.0
+MAX_RESTART_DELAY = 30.0
+MODEL_DIR = "bot/ml/trained_model"
+
+
+def update_chat_key(update):
+    """Ключ маршрутизации сырого обновления: id чата, иначе id пользователя."""
+    for field, payload in update.items():
+        if field == 'update_id' or not isinstance(payload, dict):
+            continue
+        chat = payload.get('chat') or (payload.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+        user = payload.get('from') or payload.get('user')
+        if user:
+            return user['id']
+    return update.get('update_id', 0)
+
+
+def shard_for(chat_key, workers):
+    # hash() строк случаен в каждом процессе, поэтому для них crc32
+    if isinstance(chat_key, int):
+        return chat_key % workers
+    return zlib.crc32(str(chat_key).encode()) % workers
+
+
+# ---------- Воркер ----------
+
+def _worker_main(index, workers, update_queue, report_queue):
+    # Ctrl+C получает вся группа процессов; остановкой воркеров управляет супервизор
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    # spawn не наследует настройку логирования родителя
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(_serve_worker(index, workers, update_queue, report_queue))
+    except KeyboardInterrupt:
+        pass
+
+
+class _WorkerState:
+    def __init__(self, index, max_in_flight):
+        self.index = index
+        self.slots = asyncio.Semaphore(max(1, max_in_flight))
+        self.tails = {}
+        self.tasks = set()
+        self.received = 0
+        self.processed = 0
+        self.failed = 0
+        self.handler_seconds = 0.0
+
+    def report(self):
+        return {
+            'worker': self.index,
+            'pid': os.getpid(),
+            'received': self.received,
+            'processed': self.processed,
+            'failed': self.failed,
+            'in_flight': len(self.tasks),
+            'handler_seconds': self.handler_seconds,
+        }
+
+
+async def _serve_worker(index, workers, update_queue, report_queue):
+    from bot.main import create_bot, create_dispatcher
+    from bot.utils import ml_model
+    from bot.utils.rate_limiter import outbound_limiter
+    from bot.ml.prediction_cache import prediction_cache
+    from aiogram.methods import TelegramMethod
+
+    # Общий лимит Bot API делится между воркерами поровну
+    outbound_limiter.set_global_rate(Config.TG_GLOBAL_RATE / workers, Config.TG_GLOBAL_BURST / workers)
+    # Чаты закреплены за воркером, поэтому и кэш рекомендаций у каждого свой
+    if prediction_cache.path is not None:
+        prediction_cache.path = prediction_cache.path.with_name(f"{prediction_cache.path.name}.{index}")
+
+    bot = create_bot()
+    dp = create_dispatcher()
+    state = _WorkerState(index, Config.WORKER_MAX_IN_FLIGHT)
+    loop = asyncio.get_running_loop()
+    inbox = asyncio.Queue()
+
+    async def reload_model(rescore):
+        if await ml_model.reload_ml_model() and rescore:
+            from bot.ml.rescoring import rescore_questionnaires
+            await rescore_questionnaires(ml_model.faculty_predictor)
+
+    def read_updates():
+        # Блокирующее чтение очереди процесса в отдельном потоке
+        while True:
+            message = update_queue.get()
+            loop.call_soon_threadsafe(inbox.put_nowait, message)
+            if message[0] == 'stop':
+                break
+
+    async def process(chat_key, update, previous):
+        try:
+            # Обновления одного чата обрабатываются строго по очереди
+            if previous is not None:
+                await asyncio.wait([previous])
+            started = time.perf_counter()
+            try:
+                result = await dp.feed_raw_update(bot=bot, update=update)
+                if isinstance(result, TelegramMethod):
+                    await dp.silent_call_request(bot=bot, result=result)
+                state.processed += 1
+            except Exception as e:
+                state.failed += 1
+                print(f"❌ Воркер {index}: ошибка обработки обновления: {e}")
+            finally:
+                state.handler_seconds += time.perf_counter() - started
+        finally:
+            state.slots.release()
+            if state.tails.get(chat_key) is asyncio.current_task():
+                del state.tails[chat_key]
+
+    async def report_loop():
+        while True:
+            report_queue.put(state.report())
+            await asyncio.sleep(REPORT_EVERY)
+
+    await dp.emit_startup(bot=bot, dispatcher=dp)
+    reporter = loop.create_task(report_loop())
+    threading.Thread(target=read_updates, name=f"worker-{index}-reader", daemon=True).start()
+    try:
+        while True:
+            message = await inbox.get()
+            kind = message[0]
+            if kind == 'stop':
+                break
+            if kind == 'reload_model':
+                loop.create_task(reload_model(message[1]))
+                continue
+            if kind == 'training_status':
+                ml_model.supervisor_training_status = message[1]
+                continue
+
+            _, chat_key, update = message
+            state.received += 1
+            await state.slots.acquire()
+            task = loop.create_task(process(chat_key, update, state.tails.get(chat_key)))
+            state.tails[chat_key] = task
+            state.tasks.add(task)
+            task.add_done_callback(state.tasks.discard)
+    finally:
+        if state.tasks:
+            await asyncio.wait(set(state.tasks), timeout=Config.WORKER_STOP_TIMEOUT)
+        reporter.cancel()
+        report_queue.put(state.report())
+        try:
+            await dp.emit_shutdown(bot=bot, dispatcher=dp)
+        finally:
+            await bot.session.close()
+
+
+# ---------- Супервизор ----------
+
+class _WorkerHandle:
+    __slots__ = ('index', 'process', 'queue', 'started_at', 'restarts', 'restart_at', 'routed', 'report')
+
+    def __init__(self, index):
+        self.index = index
+        self.process = None
+        self.queue = None
+        self.started_at = 0.0
+        self.restarts = 0
+        self.restart_at = None
+        self.routed = 0
+        self.report = {}
+
+
+class Supervisor:
+    """
+    Супервизор воркеров.
+
+    Сам супервизор только получает обновления и раскладывает их по воркерам
+    по хэшу id чата: диалог всегда попадает в один и тот же процесс, поэтому
+    его FSM-состояние и порядок обновлений сохраняются. Упавший воркер
+    перезапускается (при частых падениях — с нарастающей задержкой), а
+    обновления из его очереди переходят к новому процессу. Веса модели
+    воркеры открывают через mmap из общего артефакта, так что в памяти
+    они хранятся один раз в page cache.
+    """
+
+    def __init__(self, workers, report_interval=60.0, stop_timeout=30.0):
+        self.workers = max(1, workers)
+        self.report_interval = report_interval
+        self.stop_timeout = stop_timeout
+        self._context = multiprocessing.get_context("spawn")
+        self._report_queue = self._context.Queue()
+        self._handles = [_WorkerHandle(i) for i in range(self.workers)]
+        self._stopping = False
+        self.training_job = None
+        self.training_status = None
+        # offset getUpdates переживает перезапуск поллера, чтобы не получить обновления повторно
+        self.update_offset = None
+
+    def _spawn(self, handle):
+        old_queue = handle.queue
+        routed_before = handle.routed
+        handle.queue = self._context.Queue()
+        handle.routed = 0
+        if self.training_status is not None:
+            handle.queue.put(('training_status', self.training_status))
+        if old_queue is not None:
+            # Необработанные обновления упавшего воркера достаются новому процессу.
+            # get_nowait не блокирует цикл событий и не зависает, если процесс
+            # умер, держа лок очереди
+            while True:
+                try:
+                    message = old_queue.get_nowait()
+                except (queue.Empty, OSError, EOFError):
+                    break
+                if message[0] == 'training_status':
+                    # Свежий статус уже положен в новую очередь
+                    continue
+                handle.queue.put(message)
+                handle.routed += message[0] == 'update'
+            # Обновления, которые воркер уже забрал из очереди (в работе или во
+            # внутренней очереди процесса), пропали вместе с ним. Отчет мог
+            # отстать на секунду, поэтому это оценка сверху
+            finished = handle.report.get('processed', 0) + handle.report.get('failed', 0)
+            lost = max(0, routed_before - handle.routed - finished)
+            if lost:
+                print(f"⚠️ Воркер {handle.index}: потеряно до {lost} обновлений, "
+                      f"{handle.routed} передано новому процессу")
+        handle.process = self._context.Process(
+            target=_worker_main,
+            args=(handle.index, self.workers, handle.queue, self._report_queue),
+            name=f"tusur-bot-worker-{handle.index}",
+        )
+        handle.process.start()
+        handle.started_at = time.monotonic()
+        handle.restart_at = None
+        handle.report = {}
+
+    def start(self):
+        for handle in self._handles:
+            self._spawn(handle)
+        print(f"👷 Запущено воркеров: {self.workers}")
+
+    def route(self, update):
+        chat_key = update_chat_key(update)
+        handle = self._handles[shard_for(chat_key, self.workers)]
+        handle.queue.put(('update', chat_key, update))
+        handle.routed += 1
+
+    def broadcast(self, *message):
+        for handle in self._handles:
+            handle.queue.put(message)
+
+    def reload_model(self):
+        # Переоценку сохраненных анкет выполняет только один воркер
+        for handle in self._handles:
+            handle.queue.put(('reload_model', handle.index == 0))
+
+    def sync_training_status(self):
+        """Передает воркерам статус обучения, чтобы его показывала команда /model."""
+        if self.training_job is None:
+            return
+        status = self.training_job.status()
+        if status != self.training_status:
+            self.training_status = status
+            self.broadcast('training_status', status)
+
+    def check_workers(self):
+        """Перезапускает упавшие воркеры; вызывается периодически."""
+        if self._stopping:
+            return
+        now = time.monotonic()
+        for handle in self._handles:
+            if handle.process.is_alive():
+                continue
+            if handle.restart_at is None:
+                uptime = now - handle.started_at
+                delay = 0.0
+                if uptime < MIN_HEALTHY_UPTIME:
+                    delay = min(MAX_RESTART_DELAY, 2 ** min(handle.restarts, 5))
+                handle.restart_at = now + delay
+                print(f"💥 Воркер {handle.index} завершился с кодом {handle.process.exitcode}, "
+                      f"перезапуск через {delay:.0f} с")
+            if now >= handle.restart_at:
+                handle.restarts += 1
+                self._spawn(handle)
+
+    def collect_reports(self):
+        while True:
+            try:
+                report = self._report_queue.get_nowait()
+            except queue.Empty:
+                break
+            handle = self._handles[report['worker']]
+            if handle.process is not None and report['pid'] == handle.process.pid:
+                handle.report = report
+
+    def stats(self):
+        workers = []
+        for handle in self._handles:
+            report = handle.report
+            received = report.get('received', 0)
+            workers.append({
+                'worker': handle.index,
+                'pid': handle.process.pid if handle.process else None,
+                'alive': bool(handle.process and handle.process.is_alive()),
+                'restarts': handle.restarts,
+                'routed': handle.routed,
+                'queued': max(0, handle.routed - received),
+                'in_flight': report.get('in_flight', 0),
+                'processed': report.get('processed', 0),
+                'failed': report.get('failed', 0),
+                'handler_seconds': round(report.get('handler_seconds', 0.0), 1),
+            })
+        return {'workers': workers}
+
+    def log_load(self, previous):
+        """Печатает нагрузку воркеров; previous — снимок processed с прошлого раза."""
+        current = {}
+        for worker in self.stats()['workers']:
+            index = worker['worker']
+            current[index] = (worker['pid'], worker['processed'])
+            prev_pid, prev_processed = previous.get(index, (worker['pid'], 0))
+            done = worker['processed'] - (prev_processed if prev_pid == worker['pid'] else 0)
+            print(f"👷 Воркер {index} (pid {worker['pid']}): {done / self.report_interval:.1f} upd/s, "
+                  f"в очереди {worker['queued']}, в работе {worker['in_flight']}, "
+                  f"ошибок {worker['failed']}, перезапусков {worker['restarts']}")
+        return current
+
+    def stop(self):
+        """Просит воркеры доработать начатое и ждет их завершения."""
+        self._stopping = True
+        for handle in self._handles:
+            if handle.process.is_alive():
+                handle.queue.put(('stop',))
+        deadline = time.monotonic() + self.stop_timeout
+        for handle in self._handles:
+            handle.process.join(max(0.0, deadline - time.monotonic()))
+            if handle.process.is_alive():
+                print(f"⚠️ Воркер {handle.index} не остановился вовремя, завершаем принудительно")
+                handle.process.terminate()
+                handle.process.join()
+        self.collect_reports()
+
+
+async def _call_api(session, url, payload):
+    async with session.post(url, json=payload) as response:
+        return await response.json(content_type=None)
+
+
+async def _poll_updates(supervisor, stop, allowed_updates):
+    """Long polling без разбора обновлений в модели: сырые dict уходят воркерам."""
+    from aiohttp import ClientError, ClientSession, ClientTimeout
+    from aiogram.client.telegram import PRODUCTION, TelegramAPIServer
+
+    api = TelegramAPIServer.from_base(Config.TELEGRAM_API_URL) if Config.TELEGRAM_API_URL else PRODUCTION
+    polling_timeout = 30
+    backoff = 1.0
+    async with ClientSession(timeout=ClientTimeout(total=polling_timeout + 10)) as session:
+        url = api.api_url(Config.BOT_TOKEN, "getUpdates")
+        webhook_removed = False
+        while not stop.is_set():
+            payload = {'timeout': polling_timeout, 'allowed_updates': allowed_updates}
+            if supervisor.update_offset is not None:
+                payload['offset'] = supervisor.update_offset
+            try:
+                if not webhook_removed:
+                    # Для polling webhook должен быть снят, иначе getUpdates вернет ошибку
+                    await _call_api(session, api.api_url(Config.BOT_TOKEN, "deleteWebhook"), {})
+                    webhook_removed = True
+                data = await _call_api(session, url, payload)
+            except (ClientError, OSError, asyncio.TimeoutError, ValueError) as e:
+                print(f"⚠️ Ошибка получения обновлений: {e}, повтор через {backoff:.0f} с")
+                await asyncio.sleep(backoff)
+                backoff = min(backoff * 2, MAX_RESTART_DELAY)
+                continue
+            if not data.get('ok'):
+                retry_after = (data.get('parameters') or {}).get('retry_after')
+                print(f"⚠️ getUpdates: {data.get('description')}")
+                await asyncio.sleep(retry_after or backoff)
+                backoff = min(backoff * 2, MAX_RESTART_DELAY)
+                continue
+            backoff = 1.0
+            for update in data['result']:
+                supervisor.route(update)
+                supervisor.update_offset = update['update_id'] + 1
+
+
+def _load_model_once(model_dir):
+    from bot.ml.tusur_model import TusurFacultyPredictor
+    return TusurFacultyPredictor(model_path=model_dir).load_model()
+
+
+async def _migrate_legacy_model():
+    """Конвертирует модель старого формата один раз, до запуска воркеров."""
+    from bot.ml.artifact import current_version, has_legacy_model
+
+    if current_version(MODEL_DIR) is not None or not has_legacy_model(MODEL_DIR):
+        return
+    print("🔄 Конвертация модели старого формата перед запуском воркеров...")
+    # Отдельный процесс: ML-стек (а для .keras и TensorFlow) не остается в памяти супервизора
+    with ProcessPoolExecutor(max_workers=1, mp_context=multiprocessing.get_context("spawn")) as pool:
+        await asyncio.get_running_loop().run_in_executor(pool, _load_model_once, MODEL_DIR)
+
+
+async def _train_model_for_workers(supervisor):
+    # Модель обучается один раз; сам супервизор ее не загружает, а воркеры
+    # подхватывают опубликованный артефакт вместо обучения своей копии
+    from bot.ml.artifact import current_version
+    from bot.ml.training_job import TrainingJob
+
+    if current_version(MODEL_DIR) is not None:
+        return
+    print("🤖 Модель не найдена - обучение в фоновом процессе...")
+    supervisor.training_job = TrainingJob(model_dir=MODEL_DIR)
+    if await supervisor.training_job.run():
+        supervisor.reload_model()
+
+
+async def run_supervisor():
+    from bot.main import create_dispatcher, start_stats_reconcile, _background_tasks
+
+    supervisor = Supervisor(
+        Config.BOT_WORKERS,
+        report_interval=Config.WORKER_REPORT_INTERVAL,
+        stop_timeout=Config.WORKER_STOP_TIMEOUT,
+    )
+    # Диспетчер нужен только для списка используемых типов обновлений
+    allowed_updates = create_dispatcher().resolve_used_update_types()
+    await _migrate_legacy_model()
+    supervisor.start()
+
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        with suppress(NotImplementedError):
+            loop.add_signal_handler(sig, stop.set)
+
+    start_stats_reconcile()
+    _background_tasks.append(loop.create_task(_train_model_for_workers(supervisor)))
+    poller = loop.create_task(_poll_updates(supervisor, stop, allowed_updates))
+    poller_started = time.monotonic()
+    poller_restarts = 0
+    poller_restart_at = None
+    load_snapshot = {}
+    next_report = time.monotonic() + supervisor.report_interval
+    try:
+        while not stop.is_set():
+            with suppress(asyncio.TimeoutError):
+                await asyncio.wait_for(stop.wait(), timeout=REPORT_EVERY)
+            if poller.done() and not stop.is_set():
+                now = time.monotonic()
+                if poller_restart_at is None:
+                    error = None if poller.cancelled() else poller.exception()
+                    if now - poller_started >= MIN_HEALTHY_UPTIME:
+                        poller_restarts = 0
+                    delay = min(MAX_RESTART_DELAY, 2 ** min(poller_restarts, 5))
+                    poller_restart_at = now + delay
+                    print(f"❌ Получение обновлений остановилось с ошибкой: {error}, "
+                          f"перезапуск через {delay:.0f} с")
+                if now >= poller_restart_at:
+                    poller_restarts += 1
+                    poller_restart_at = None
+                    poller_started = now
+                    poller = loop.create_task(_poll_updates(supervisor, stop, allowed_updates))
+            supervisor.collect_reports()
+            supervisor.check_workers()
+            supervisor.sync_training_status()
+            if time.monotonic() >= next_report:
+                load_snapshot = supervisor.log_load(load_snapshot)
+                next_report += supervisor.report_interval
+    finally:
+        poller.cancel()
+        error = (await asyncio.gather(poller, return_exceptions=True))[0]
+        if error is not None and not isinstance(error, asyncio.CancelledError):
+            print(f"❌ Получение обновлений остановилось с ошибкой: {error}")
+        for task in _background_tasks:
+            task.cancel()
+        await loop.run_in_executor(None, supervisor.stop)
+        print(f"📊 Воркеры: {json.dumps(supervisor.stats(), ensure_ascii=False)}")
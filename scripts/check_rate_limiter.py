@@ -0,0 +1,129 @@
+"""
+Проверка ограничителя исходящих запросов на локальной заглушке Bot API:
+порядок по приоритетам, пополнение ведра чата, повтор после 429 и пауза
+всего бота при 429 в нескольких чатах.
+
+Запуск из корня проекта: python -m scripts.check_rate_limiter
+"""
+import asyncio
+import sys
+import time
+
+from aiogram import Bot
+from aiohttp import web
+
+from bot.utils.rate_limiter import RateLimitMiddleware, create_bot_session
+
+
+async def check_against_stub_api():
+    """Возвращает True, если все проверки прошли."""
+    calls = []
+    flood_chats = set()
+
+    async def handle(request):
+        method = request.match_info['method']
+        data = await request.post()
+        chat_id = data.get('chat_id')
+        calls.append((time.monotonic(), method, chat_id))
+        if chat_id in flood_chats:
+            flood_chats.discard(chat_id)
+            return web.json_response({
+                'ok': False, 'error_code': 429, 'description': 'Too Many Requests: retry after 1',
+                'parameters': {'retry_after': 1},
+            }, status=429)
+        if method == 'answerCallbackQuery':
+            return web.json_response({'ok': True, 'result': True})
+        return web.json_response({'ok': True, 'result': {
+            'message_id': len(calls), 'date': 0, 'chat': {'id': int(chat_id), 'type': 'private'}, 'text': 'ok',
+        }})
+
+    app = web.Application()
+    app.router.add_post('/bot{token}/{method}', handle)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', 0).start()
+    host, port = runner.addresses[0][:2]
+
+    results = []
+
+    async def run_case(name, limiter, requests, check, flood=()):
+        calls.clear()
+        flood_chats.update(flood)
+        bot = Bot('123:stub', session=create_bot_session(f"http://{host}:{port}", limiter))
+        try:
+            await asyncio.gather(*(request(bot) for request in requests))
+            ok, details = check(limiter)
+        except Exception as e:
+            ok, details = False, repr(e)
+        finally:
+            await limiter.close()
+            await bot.session.close()
+        results.append(ok)
+        print(f"{'✅' if ok else '❌'} {name}: {details}")
+
+    def priority_order(limiter):
+        order = [method for _, method, _ in calls]
+        expected = ['answerCallbackQuery'] * 2 + ['sendMessage'] * 3
+        return order == expected, order
+
+    await run_case(
+        "приоритеты",
+        RateLimitMiddleware(global_rate=10, global_burst=1),
+        [lambda bot, i=i: bot.send_message(100 + i, 'bulk') for i in range(3)]
+        + [lambda bot, i=i: bot.answer_callback_query(f'q{i}') for i in range(2)],
+        priority_order,
+    )
+
+    def chat_refill(limiter):
+        gaps = [round(b[0] - a[0], 2) for a, b in zip(calls, calls[1:])]
+        return len(calls) == 4 and all(gap >= 0.45 for gap in gaps), f"интервалы {gaps}"
+
+    await run_case(
+        "пополнение ведра чата",
+        RateLimitMiddleware(global_rate=100, global_burst=100, chat_rate=2, chat_burst=1),
+        [lambda bot, i=i: bot.send_message(7, f'm{i}') for i in range(4)],
+        chat_refill,
+    )
+
+    def retry_after(limiter):
+        waited = round(calls[-1][0] - calls[0][0], 2) if len(calls) == 2 else None
+        ok = waited is not None and waited >= 0.95 and limiter.retries == 1
+        return ok, f"повтор через {waited} с, retries={limiter.retries}"
+
+    await run_case(
+        "повтор после 429",
+        RateLimitMiddleware(global_rate=100, global_burst=100),
+        [lambda bot: bot.send_message(42, 'flood')],
+        retry_after,
+        flood={'42'},
+    )
+
+    async def flood_then_other_chat(bot):
+        await asyncio.gather(bot.send_message(42, 'flood'), bot.send_message(43, 'flood'))
+
+    async def other_chat_after_floods(bot):
+        # Отправляется, когда оба 429 уже получены
+        while len(calls) < 2:
+            await asyncio.sleep(0.01)
+        await bot.send_message(44, 'other')
+
+    def global_pause(limiter):
+        first = calls[0][0]
+        other = [round(at - first, 2) for at, _, chat_id in calls if chat_id == '44']
+        ok = len(other) == 1 and other[0] >= 0.95
+        return ok, f"запрос в другой чат через {other} с"
+
+    await run_case(
+        "пауза всего бота при 429 в нескольких чатах",
+        RateLimitMiddleware(global_rate=100, global_burst=100),
+        [flood_then_other_chat, other_chat_after_floods],
+        global_pause,
+        flood={'42', '43'},
+    )
+
+    await runner.cleanup()
+    return all(results)
+
+
+if __name__ == "__main__":
+    sys.exit(0 if asyncio.run(check_against_stub_api()) else 1)